@@ -0,0 +1,152 @@
+"""Counts Surface and Rect allocations per frame by call site
+
+Enable in game with CUBE_RUNNER_ALLOC_TRACK=1; a report is printed on exit.
+Surfaces created by pygame.Surface(), Font.render() and transform.rotate()
+are counted, as are Rects built with pygame.Rect(). Rects that pygame
+returns from C (get_rect() and friends) can't be seen from Python and are
+not included.
+"""
+import atexit
+import os
+import sys
+import tracemalloc
+from collections import Counter
+
+import pygame
+import pygame.sysfont
+
+
+class AllocationTracker:
+    """Swaps pygame's constructors for counting versions while installed"""
+    def __init__(self, snapshot_interval=600, top=10):
+        self.enabled = False
+        self.snapshot_interval = snapshot_interval
+        self.top = top
+        self.frame = Counter()      # (kind, call site) -> count for the current frame
+        self.totals = Counter()     # Same, summed over every finished frame
+        self.per_frame = []         # Surfaces allocated in each finished frame
+        self.frames = 0
+        self.snapshots = []
+        self.originals = {}
+
+    @classmethod
+    def from_env(cls, variable="CUBE_RUNNER_ALLOC_TRACK"):
+        tracker = cls()
+        if os.environ.get(variable):
+            tracker.install()
+            atexit.register(tracker.print_report)
+        return tracker
+
+    def _site(self, depth=2):
+        caller = sys._getframe(depth)
+        return f"{os.path.basename(caller.f_code.co_filename)}:{caller.f_lineno} ({caller.f_code.co_name})"
+
+    def install(self, trace_memory=True):
+        if self.enabled:
+            return
+        tracker = self
+
+        class CountingSurface(pygame.Surface):
+            def __init__(self, *args, **kwargs):
+                tracker.frame["Surface", tracker._site()] += 1
+                super().__init__(*args, **kwargs)
+
+        class CountingRect(pygame.Rect):
+            def __init__(self, *args, **kwargs):
+                tracker.frame["Rect", tracker._site()] += 1
+                super().__init__(*args, **kwargs)
+
+        class CountingFont(pygame.font.Font):
+            def render(self, *args, **kwargs):
+                tracker.frame["Surface", tracker._site()] += 1
+                return super().render(*args, **kwargs)
+
+        original_rotate = pygame.transform.rotate
+
+        def counting_rotate(*args, **kwargs):
+            tracker.frame["Surface", tracker._site()] += 1
+            return original_rotate(*args, **kwargs)
+
+        self.originals = {
+            (pygame, "Surface"): pygame.Surface,
+            (pygame, "Rect"): pygame.Rect,
+            (pygame.font, "Font"): pygame.font.Font,
+            (pygame.sysfont, "Font"): pygame.sysfont.Font,
+            (pygame.transform, "rotate"): original_rotate,
+        }
+        pygame.Surface = CountingSurface
+        pygame.Rect = CountingRect
+        pygame.font.Font = pygame.sysfont.Font = CountingFont
+        pygame.transform.rotate = counting_rotate
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(5)
+        self.enabled = True
+
+    def uninstall(self):
+        for (module, name), original in self.originals.items():
+            setattr(module, name, original)
+        self.originals = {}
+        self.enabled = False
+
+    def end_frame(self):
+        """Close the current frame's counts; takes a tracemalloc snapshot every interval"""
+        if not self.enabled:
+            return
+        self.per_frame.append(sum(count for (kind, _), count in self.frame.items() if kind == "Surface"))
+        self.totals.update(self.frame)
+        self.frame.clear()
+        self.frames += 1
+        if tracemalloc.is_tracing() and self.frames % self.snapshot_interval == 1:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),))
+            self.snapshots.append((self.frames, snapshot))
+
+    def print_report(self):
+        if not self.frames:
+            return
+        print(f"\nAllocations over {self.frames} frames")
+        surfaces = sorted(self.per_frame)
+        print(f"Surfaces per frame: mean {sum(surfaces) / len(surfaces):.1f}, "
+              f"max {surfaces[-1]}, frames with none: "
+              f"{sum(1 for n in surfaces if n == 0)}")
+        print("\nTop call sites (per frame):")
+        for (kind, site), count in self.totals.most_common(self.top):
+            print(f"  {count / self.frames:8.2f}  {kind:<8} {site}")
+
+        if len(self.snapshots) >= 2:
+            first_frame, first = self.snapshots[0]
+            last_frame, last = self.snapshots[-1]
+            print(f"\nPython heap growth between frame {first_frame} and frame {last_frame}:")
+            for stat in last.compare_to(first, "lineno")[:self.top]:
+                print(f"  {stat}")
+        if self.snapshots:
+            print("\nLargest live allocations at the last snapshot:")
+            for stat in self.snapshots[-1][1].statistics("lineno")[:self.top]:
+                print(f"  {stat}")
+
+
+def assert_no_surface_allocations(step, frames=60, warmup=10):
+    """Run `step()` once per frame and fail if any steady-state frame allocated a Surface
+
+    The first `warmup` frames may fill caches and are not checked.
+    """
+    tracker = AllocationTracker()
+    tracker.install(trace_memory=False)
+    try:
+        for _ in range(warmup):
+            step()
+            tracker.end_frame()
+        tracker.totals.clear()
+        tracker.per_frame = []
+        for _ in range(frames):
+            step()
+            tracker.end_frame()
+    finally:
+        tracker.uninstall()
+
+    allocated = sum(tracker.per_frame)
+    if allocated:
+        sites = [f"{count}x {site}" for (kind, site), count in tracker.totals.most_common()
+                 if kind == "Surface"]
+        raise AssertionError(f"{allocated} surfaces allocated over {frames} steady-state frames: "
+                             + "; ".join(sites[:5]))
@@ -0,0 +1,161 @@
+"""Autopilot that plans jumps analytically from the game's physics constants"""
+import math
+import os
+import sys
+import time
+
+
+class Autopilot:
+    """Decides each frame whether to press jump, from a closed-form jump arc
+
+    The player integrates `vel += gravity; y += vel` once per update, so after
+    n updates of a jump the height above the ground is
+    h(n) = n*J - g*n*(n+1)/2. For an obstacle whose hitbox overlaps the
+    player horizontally during frames [k_first, k_last], the press frames
+    that keep h above the obstacle for that whole span follow directly from
+    the roots of h(n) = H.
+    """
+    def __init__(self, gravity, jump_force, ground_y, player_hitbox, obstacle_hitbox, lookahead=3):
+        self.gravity = gravity
+        self.jump_force = jump_force
+        self.ground_y = ground_y  # Player y when standing on the ground
+        self.player_hitbox = player_hitbox
+        self.obstacle_hitbox = obstacle_hitbox
+        self.lookahead = lookahead
+        self.enabled = False
+        # First update after the press at which the player is back on the ground
+        self.air_ticks = math.floor(2 * jump_force / gravity - 1) + 1
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    def airborne_range(self, clearance):
+        """Air ticks (1-based) during which the jump is at least `clearance` high"""
+        if clearance <= 0:
+            return 1, self.air_ticks - 1
+        half_g = self.gravity / 2
+        b = self.jump_force - half_g
+        disc = b * b - 4 * half_g * clearance
+        if disc < 0:
+            return None
+        root = math.sqrt(disc)
+        return math.ceil((b - root) / self.gravity), math.floor((b + root) / self.gravity)
+
+    def press_window(self, player, obstacle, game_speed):
+        """Frames from now (0 = this frame) at which a press clears `obstacle`
+
+        Returns (earliest, latest), which is empty when earliest > latest, or
+        None when the obstacle is already behind the player.
+        """
+        player_box = self.player_hitbox(player)
+        box = self.obstacle_hitbox(obstacle)
+
+        # Obstacles move before the collision test, so after frame k an
+        # obstacle edge at `a` sits at a - speed*(k+1), and the boxes overlap
+        # from frame (left gap)/speed - 1 to (right gap)/speed - 1. Rounding
+        # the first frame down and the last one up widens the range to whole
+        # frames, which also covers Rect's truncation of fractional positions.
+        k_first = math.floor((box.left - player_box.right) / game_speed - 1)
+        k_last = math.ceil((box.right - player_box.left) / game_speed - 1)
+        if k_last < 0:
+            return None
+        k_first = max(k_first, 0)
+
+        ground_bottom = self.ground_y + (player_box.bottom - player.y)
+        airborne = self.airborne_range(ground_bottom - box.top)
+        if airborne is None:
+            return 1, 0
+        n_lo, n_hi = airborne
+        # Pressing on frame d puts the player at air tick k - d + 1 on frame k
+        return k_last + 1 - n_hi, k_first + 1 - n_lo
+
+    def should_jump(self, player, obstacles, game_speed):
+        """True when this is the planned frame to press jump"""
+        if player.jumping or game_speed <= 0:
+            return False
+
+        windows = []
+        for obstacle in obstacles:
+            window = self.press_window(player, obstacle, game_speed)
+            if window is None:
+                continue
+            windows.append(window)
+            if len(windows) == self.lookahead:
+                break
+        if not windows:
+            return False
+
+        earliest, latest = windows[0]
+        for next_earliest, next_latest in windows[1:]:
+            if max(earliest, next_earliest) <= min(latest, next_latest):
+                # One jump clears both, aim for the overlap
+                earliest, latest = max(earliest, next_earliest), min(latest, next_latest)
+            else:
+                # Land in time to jump again for the next one
+                latest = min(latest, next_latest - self.air_ticks)
+                break
+
+        if earliest > latest:
+            # No clean window, so jump at the last moment that still helps
+            return latest <= 0
+        return (earliest + latest) // 2 <= 0
+
+
+def run_headless(seconds, seed, patterns='classic', difficulty='classic'):
+    """Play the game without a window at full speed and report how the bot did"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import main as game
+    from level_stream import SPEED_STEP, SPEED_STEP_SECONDS, TICKS_PER_SECOND, LevelStream
+
+    bot = game.create_autopilot()
+    bot.enabled = True
+    level = LevelStream(seed, patterns, difficulty)
+    player = game.Player()
+    obstacles = game.ObstaclePool()
+    game_speed = game.INITIAL_GAME_SPEED
+    scroll_distance = 0
+    cleared = 0
+    deaths = 0
+    decide_time = 0.0
+    ticks = int(seconds * 60)
+
+    for tick in range(ticks):
+        if tick and tick % (SPEED_STEP_SECONDS * TICKS_PER_SECOND) == 0 and game_speed < game.MAX_GAME_SPEED:
+            game_speed = min(game_speed + SPEED_STEP, game.MAX_GAME_SPEED)
+
+        start = time.perf_counter()
+        if bot.should_jump(player, obstacles, game_speed):
+            player.jump()
+        decide_time += time.perf_counter() - start
+
+        player.update()
+        spawn = level.pop_due(scroll_distance)
+        while spawn is not None:
+            obstacles.spawn(game.WIDTH - (scroll_distance - spawn.position), spawn.shape_type,
+                            game_speed, spawn.width, spawn.height)
+            spawn = level.pop_due(scroll_distance)
+        cleared += obstacles.update(game_speed)
+        scroll_distance += game_speed
+
+        for obstacle in obstacles:
+            if game.swept_collision(player, obstacle) is not None:
+                deaths += 1
+                obstacles.clear()
+                break
+
+    print(f"seed={level.seed} ticks={ticks} cleared={cleared} deaths={deaths} "
+          f"decide={decide_time / ticks * 1e6:.2f}us/tick")
+    return cleared, deaths
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the autopilot headless as a soak test")
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--patterns", default='classic')
+    parser.add_argument("--difficulty", default='classic')
+    args = parser.parse_args()
+    _, deaths = run_headless(args.seconds, args.seed, args.patterns, args.difficulty)
+    sys.exit(1 if deaths else 0)
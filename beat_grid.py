@@ -0,0 +1,75 @@
+"""Obstacle spawns laid out on the music's beat grid"""
+import math
+
+from level_stream import (INITIAL_GAME_SPEED, MAX_GAME_SPEED, SPEED_STEP, SPEED_STEP_SECONDS,
+                          TICKS_PER_SECOND, LevelStream, Spawn)
+
+
+class BeatGrid(LevelStream):
+    """A level stream whose obstacles reach the player exactly on beats
+
+    The game speeds up by SPEED_STEP every SPEED_STEP_SECONDS, so scroll
+    distance is a piecewise linear function of play time. Each speed level
+    is generated in one go: every pattern is snapped to the beat nearest the
+    gap the difficulty curve asks for, and placed so its centre is `lead`
+    pixels of scrolling past its spawn point on that beat. The game scrolls
+    to distance_at(play time) each frame instead of adding the speed once
+    per update, so a dropped frame moves the world further rather than
+    letting it fall behind the music.
+    """
+    def __init__(self, seed=None, bpm=120, lead=0, patterns='classic', difficulty='classic',
+                 max_speed=MAX_GAME_SPEED, offset_ms=0):
+        self.beat_ms = 60000 / bpm
+        self.offset_ms = offset_ms  # Play time of the first beat
+        self.lead = lead
+        self.stage_ms = SPEED_STEP_SECONDS * 1000
+        self.stage_starts = [0.0]  # Scroll distance at the start of each speed level
+        self.stage = 0             # Next speed level to generate
+        self.next_beat = 0         # Beats before this one are taken
+        super().__init__(seed, patterns, difficulty, max_speed=max_speed)
+
+    def speed_at(self, ms):
+        """Game speed after `ms` of play"""
+        return min(INITIAL_GAME_SPEED + SPEED_STEP * int(ms // self.stage_ms), self.max_speed)
+
+    def _stage_start(self, stage):
+        while len(self.stage_starts) <= stage:
+            previous = len(self.stage_starts) - 1
+            self.stage_starts.append(self.stage_starts[-1] + self.speed_at(previous * self.stage_ms)
+                                     * TICKS_PER_SECOND * SPEED_STEP_SECONDS)
+        return self.stage_starts[stage]
+
+    def distance_at(self, ms):
+        """Scroll distance after `ms` of play"""
+        stage = int(ms // self.stage_ms)
+        return (self._stage_start(stage)
+                + self.speed_at(ms) * TICKS_PER_SECOND * (ms - stage * self.stage_ms) / 1000)
+
+    def time_at(self, distance):
+        """Play time in ms at which the world has scrolled `distance`"""
+        stage = 0
+        while self._stage_start(stage + 1) <= distance:
+            stage += 1
+        speed = self.speed_at(stage * self.stage_ms)
+        return stage * self.stage_ms + (distance - self._stage_start(stage)) * 1000 / (speed * TICKS_PER_SECOND)
+
+    def _generate_chunk(self):
+        """Append the spawns of the next speed level"""
+        stage_end = (self.stage + 1) * self.stage_ms
+        while True:
+            difficulty = self.difficulty(self.cursor, self.max_speed)
+            pieces, length = self._pick_pattern()(self.rng, difficulty)
+            # The nearest free beat to the cursor, late enough to spawn off screen
+            earliest = math.ceil((self.time_at(self.lead + length / 2) - self.offset_ms) / self.beat_ms)
+            beat = max(self.next_beat, earliest, round((self.time_at(self.cursor) - self.offset_ms) / self.beat_ms))
+            beat_ms = self.offset_ms + beat * self.beat_ms
+            if beat_ms >= stage_end:
+                break
+            arrival = self.distance_at(beat_ms)
+            start = arrival - self.lead - length / 2
+            for offset, shape_type, width, height in pieces:
+                self.pending.append(Spawn(start + offset, shape_type, width, height))
+            self.next_beat = beat + 1
+            self.cursor = arrival + length + self.rng.uniform(difficulty['min_gap'], difficulty['max_gap'])
+        self.stage += 1
+        self.generated_to = self.distance_at(stage_end)
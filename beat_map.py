@@ -0,0 +1,95 @@
+"""Beat and onset maps written by music_analysis.py, loaded without numpy
+
+File layout (little endian), stored next to the audio as <track>.cr84b:
+
+    8s   magic b"CR84BMP\\0"
+    H    format version
+    f    tempo in beats per minute
+    f    time of the first beat in ms
+    f    track length in ms
+    I    number of beats
+    I    number of onsets
+    ...  beat times, one f per beat, in ms
+    ...  onset times, one f per onset, in ms
+    ...  onset strengths, one B per onset, 255 for the strongest
+
+A minute of music maps to about 3 KB, so the game reads it in well under
+a millisecond and never has to analyse audio itself.
+"""
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b"CR84BMP\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHfffII")
+EXTENSION = ".cr84b"
+
+
+class BeatMap:
+    """Tempo, beat times and onsets of one track"""
+    def __init__(self, bpm, offset_ms, duration_ms, beats, onsets, strengths):
+        self.bpm = bpm
+        self.offset_ms = offset_ms
+        self.duration_ms = duration_ms
+        self.beats = beats          # array('f') of ms
+        self.onsets = onsets        # array('f') of ms
+        self.strengths = strengths  # bytes, one per onset
+
+    @property
+    def beat_ms(self):
+        return 60000 / self.bpm
+
+
+def path_for(audio_path):
+    """Where the beat map of `audio_path` lives"""
+    return os.path.splitext(audio_path)[0] + EXTENSION
+
+
+def write_beat_map(path, beat_map):
+    """Write `beat_map`; returns the file size in bytes"""
+    beats = array('f', beat_map.beats)
+    onsets = array('f', beat_map.onsets)
+    if sys.byteorder != "little":
+        beats.byteswap()
+        onsets.byteswap()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, beat_map.bpm, beat_map.offset_ms, beat_map.duration_ms,
+                            len(beats), len(onsets)))
+        f.write(beats.tobytes())
+        f.write(onsets.tobytes())
+        f.write(bytes(beat_map.strengths))
+        return f.tell()
+
+
+def load_beat_map(path):
+    """Read a beat map file; raises ValueError if it isn't one"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a beat map")
+    magic, version, bpm, offset_ms, duration_ms, beat_count, onset_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a beat map")
+    if len(data) != HEADER.size + beat_count * 4 + onset_count * 5 or bpm <= 0:
+        raise ValueError(f"{path} is truncated")
+    beats = array('f', data[HEADER.size:HEADER.size + beat_count * 4])
+    onsets_end = HEADER.size + beat_count * 4 + onset_count * 4
+    onsets = array('f', data[HEADER.size + beat_count * 4:onsets_end])
+    if sys.byteorder != "little":
+        beats.byteswap()
+        onsets.byteswap()
+    return BeatMap(bpm, offset_ms, duration_ms, beats, onsets, data[onsets_end:])
+
+
+def find_beat_map(audio_path):
+    """The beat map stored next to `audio_path`, or None if there is no usable one"""
+    try:
+        return load_beat_map(path_for(audio_path))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring beat map: {e}")
+        return None
+
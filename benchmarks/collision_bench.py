@@ -0,0 +1,58 @@
+"""Cost of check_collision per frame with many obstacles on screen"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import main as game
+
+
+def build_scene(count, near_fraction, seed=1):
+    """Player mid-jump with `count` obstacles, a share of them overlapping its bounding box"""
+    rng = random.Random(seed)
+    player = game.Player()
+    player.y -= 30
+    player.prev_y = player.y + 15  # Rising fast, so the swept test has vertical motion
+    obstacles = game.ObstaclePool(capacity=count)
+    for i in range(count):
+        shape_type = "triangle" if i % 2 else "rect"
+        if rng.random() < near_fraction:
+            x = player.x + rng.randint(-30, 30)
+        else:
+            x = rng.randint(player.x + 80, game.WIDTH)
+        obstacles.spawn(x, shape_type, game.INITIAL_GAME_SPEED)
+    obstacles.update(game.MAX_GAME_SPEED)
+    return player, obstacles
+
+
+def time_frames(check, player, obstacles, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        for obstacle in obstacles:
+            check(player, obstacle)
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--obstacles", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    frame_budget = 1 / 60
+    print(f"{'test':>8} {'near hits':>10} {'us/frame':>10} {'% of 60 fps frame':>18}")
+    for name, check in (("discrete", game.check_collision), ("swept", game.swept_collision)):
+        for near_fraction in (0.0, 0.1, 0.5, 1.0):
+            player, obstacles = build_scene(args.obstacles, near_fraction)
+            per_frame = time_frames(check, player, obstacles, args.frames)
+            print(f"{name:>8} {near_fraction:>10.0%} {per_frame * 1e6:>10.1f} {per_frame / frame_budget:>18.2%}")
+    print(f"cached masks: {len(game.mask_cache)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Time the leaderboard queries against a high score database with many runs
+
+Usage: python benchmarks/highscore_bench.py [--rows 1000000] [--path /tmp/highscores_bench.sqlite3]
+
+The database is filled once and reused on later runs with the same row count.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from highscores import INSERT, HighScoreStore, connect
+
+DAYS = 365
+SEEDS = 5000
+PLAYERS = 2000
+
+
+def fill(path, rows):
+    connection = connect(path)
+    existing = connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    if existing == rows:
+        connection.close()
+        return
+    connection.execute("DELETE FROM runs")
+    rng = random.Random(1)
+    now = time.time()
+    batch = []
+    start = time.perf_counter()
+    with connection:
+        for i in range(rows):
+            played_at = now - rng.random() * DAYS * 86400
+            batch.append((f"player{rng.randrange(PLAYERS)}", int(rng.expovariate(1 / 300)),
+                          time.strftime("%Y-%m-%d", time.localtime(played_at)), played_at,
+                          rng.randrange(SEEDS), rng.random() * 120, ""))
+            if len(batch) == 10000:
+                connection.executemany(INSERT, batch)
+                batch = []
+        connection.executemany(INSERT, batch)
+    connection.execute("ANALYZE")
+    connection.close()
+    print(f"Inserted {rows} runs in {time.perf_counter() - start:.1f} s")
+
+
+def timed(query, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        query()
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99)]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--path", default=os.path.join("/tmp", "highscores_bench.sqlite3"))
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    fill(args.path, args.rows)
+    store = HighScoreStore(args.path)
+    today = store.top(1)[0][2]
+    queries = {
+        "top 10": ("", (), lambda: store.top(10)),
+        "top 10 for a day": ("WHERE day = ?", (today,), lambda: store.top_for_day(today, 10)),
+        "top 10 for a level": ("WHERE seed = ? AND level = ?", (1, ""),
+                               lambda: store.top_for_level(random.randrange(SEEDS), "", 10)),
+        "top 10 for a player": ("WHERE player = ?", ("player1",),
+                                lambda: store.top_for_player(f"player{random.randrange(PLAYERS)}", 10)),
+    }
+    print(f"{store.count()} runs in {args.path}")
+    print(f"{'query':<22}{'p50 us':>9}{'p99 us':>9}  plan")
+    for name, (where, parameters, query) in queries.items():
+        p50, p99 = timed(query, args.repeats)
+        plan = store.reader.execute(f"EXPLAIN QUERY PLAN SELECT * FROM runs {where} ORDER BY score DESC LIMIT 10",
+                                    parameters).fetchall()
+        print(f"{name:<22}{p50:>9.1f}{p99:>9.1f}  {'; '.join(row[-1] for row in plan)}")
+
+    # Writes go through the queue, so add() should cost next to nothing
+    start = time.perf_counter()
+    for i in range(1000):
+        store.add("bench", i, 0, 1.0)
+    print(f"add() {(time.perf_counter() - start) * 1000:.1f} us per call")
+    store.close()
+    # Leave the database as filled so the next run can reuse it
+    connection = connect(args.path)
+    with connection:
+        connection.execute("DELETE FROM runs WHERE player = 'bench'")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Deterministic headless rendering benchmarks for the real draw code
+
+Usage:
+    python benchmarks/render_bench.py --output results.json
+    python benchmarks/render_bench.py --compare benchmarks/baseline.json --threshold 0.15
+"""
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import main as game
+from level_stream import Spawn
+
+game.init_display()
+# The game bakes its halos just after its first frame, and each obstacle size
+# before it reaches the screen. Obstacles spawned before a run are baked as
+# they spawn; those spawned during one reuse RESPAWN_SIZE, baked just before.
+game.bake_halos()
+game.options.palette = True  # And the palette player's, for the palette scenarios
+game.bake_halos()
+game.options.palette = False
+
+RESPAWN_SIZE = 30
+RESPAWNS = [Spawn(0, shape_type, RESPAWN_SIZE, RESPAWN_SIZE) for shape_type in ("rect", "triangle")]
+
+# Functions timed individually, as (label, owner, attribute name)
+TIMED_FUNCTIONS = [
+    ("BackgroundEffect.draw", game.BackgroundEffect, "draw"),
+    ("Player.draw", game.Player, "draw"),
+    ("Obstacle.draw", game.Obstacle, "draw"),
+    ("draw_ground", game, "draw_ground"),
+    ("show_score_and_speed", game, "show_score_and_speed"),
+    ("show_game_over", game, "show_game_over"),
+]
+
+SCENARIOS = {
+    "idle_background": {"obstacles": 0},
+    "obstacles_5": {"obstacles": 5},
+    "obstacles_50": {"obstacles": 50},
+    "obstacles_500": {"obstacles": 500},
+    "long_trail": {"obstacles": 5, "trail": 200},
+    "game_over": {"obstacles": 5, "game_over": True},
+    "max_speed": {"obstacles": 5, "speed": game.MAX_GAME_SPEED},
+    "palette": {"obstacles": 5, "palette": True},
+    "palette_long_trail": {"obstacles": 5, "trail": 200, "palette": True},
+}
+
+
+class FunctionTimer:
+    """Wraps the timed functions in place and accumulates their cost"""
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+        self.originals = []
+
+    def install(self):
+        for label, owner, name in TIMED_FUNCTIONS:
+            original = getattr(owner, name)
+            self.originals.append((owner, name, original))
+            setattr(owner, name, self._wrap(label, original))
+
+    def uninstall(self):
+        for owner, name, original in self.originals:
+            setattr(owner, name, original)
+        self.originals = []
+
+    def reset(self):
+        self.totals = {label: 0.0 for label, _, _ in TIMED_FUNCTIONS}
+        self.calls = {label: 0 for label, _, _ in TIMED_FUNCTIONS}
+
+    def _wrap(self, label, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            self.totals[label] += time.perf_counter() - start
+            self.calls[label] += 1
+            return result
+        return timed
+
+
+def run_scenario(config, frames):
+    """Drive one scenario through the draw code and return the elapsed seconds"""
+    random.seed(1234)
+    speed = config.get("speed", game.INITIAL_GAME_SPEED)
+    count = config.get("obstacles", 0)
+    game.options.palette = config.get("palette", False)
+
+    background = game.BackgroundEffect(speed)
+    player = game.Player()
+    player.trail_max = config.get("trail", player.trail_max)
+    obstacles = game.ObstaclePool(capacity=max(count, 1))
+    for i in range(count):
+        obstacles.spawn(random.uniform(0, game.WIDTH), "rect" if i % 3 else "triangle", speed)
+    game.bake_obstacle_sprites(RESPAWNS)
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        background.update(speed)
+        if not player.jumping:
+            player.jump()
+        player.update()
+        for _ in range(obstacles.update(speed)):
+            obstacles.spawn(game.WIDTH, "rect" if frame % 3 else "triangle", speed, RESPAWN_SIZE, RESPAWN_SIZE)
+
+        background.draw()
+        game.draw_ground()
+        for obstacle in obstacles:
+            obstacle.draw()
+        player.draw()
+        game.show_score_and_speed(frame, frame // 30, speed / game.INITIAL_GAME_SPEED)
+        if config.get("game_over"):
+            game.show_game_over(frame, frame / 60)
+        game.present_frame()
+    return time.perf_counter() - start
+
+
+def run_all(frames, repeats=5, only=None):
+    """Run every scenario `repeats` times and keep the fastest figure for each metric
+
+    The repeats go round all the scenarios in turn rather than one scenario at
+    a time, so a few seconds of a busy machine slow one run of each instead of
+    every run of one.
+    """
+    timer = FunctionTimer()
+    timer.install()
+    scenarios = {name: config for name, config in SCENARIOS.items() if not only or name in only}
+    best = {name: None for name in scenarios}
+    functions = {name: {} for name in scenarios}
+    try:
+        for name, config in scenarios.items():
+            # Warm caches (fonts, masks) outside the measured runs
+            timer.reset()
+            run_scenario(config, min(frames, 30))
+
+        for _ in range(repeats):
+            for name, config in scenarios.items():
+                timer.reset()
+                elapsed = run_scenario(config, frames)
+                best[name] = elapsed if best[name] is None else min(best[name], elapsed)
+                for label, total in timer.totals.items():
+                    if not timer.calls[label]:
+                        continue
+                    cost = {
+                        "ms_per_frame": total / frames * 1000,
+                        "calls_per_frame": timer.calls[label] / frames,
+                    }
+                    if label not in functions[name] or cost["ms_per_frame"] < functions[name][label]["ms_per_frame"]:
+                        functions[name][label] = cost
+        results = {name: {
+            "fps": frames / best[name],
+            "frame_ms": best[name] / frames * 1000,
+            "functions": functions[name],
+        } for name in scenarios}
+    finally:
+        timer.uninstall()
+    return {
+        "meta": {
+            "frames": frames,
+            "repeats": repeats,
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+        },
+        "scenarios": results,
+    }
+
+
+def compare(results, baseline, threshold, floor=0.0):
+    """Return a list of human-readable regressions beyond `threshold` and `floor` ms/frame"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            # A scenario added since the baseline was recorded would otherwise never be checked
+            regressions.append(f"{name}: not in the baseline, re-record it with --output")
+            continue
+        checks = [("frame", current["frame_ms"], base["frame_ms"])]
+        for label, stats in current["functions"].items():
+            if label in base["functions"]:
+                checks.append((label, stats["ms_per_frame"], base["functions"][label]["ms_per_frame"]))
+        for label, now, before in checks:
+            if before > 0 and now > before * (1 + threshold) and now - before > floor:
+                regressions.append(f"{name}: {label} {before:.3f} -> {now:.3f} ms/frame "
+                                   f"(+{(now / before - 1):.0%})")
+    return regressions
+
+
+def print_table(results):
+    labels = [label for label, _, _ in TIMED_FUNCTIONS]
+    short = [label.split(".")[0][:10] if "." in label else label[:10] for label in labels]
+    print(f"{'scenario':<16}{'fps':>8}{'ms':>8}" + "".join(f"{s:>12}" for s in short))
+    for name, stats in results["scenarios"].items():
+        row = f"{name:<16}{stats['fps']:>8.0f}{stats['frame_ms']:>8.2f}"
+        for label in labels:
+            cost = stats["functions"].get(label)
+            row += f"{cost['ms_per_frame']:>12.3f}" if cost else f"{'-':>12}"
+        print(row)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Headless rendering benchmarks")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Runs per scenario; the fastest is reported to damp noise")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Only run the named scenario (repeatable)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--floor", type=float, default=0.02,
+                        help="Smallest slowdown in ms/frame worth flagging; the cheapest functions "
+                             "take a few hundredths of a ms and jitter by more than the threshold (default 0.02)")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed slowdown before flagging a regression (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results = run_all(args.frames, args.repeats, args.scenario)
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.floor)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} and {args.floor} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
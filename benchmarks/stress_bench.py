@@ -0,0 +1,160 @@
+"""Scale each subsystem's entity count and report where its cost stops being linear
+
+Usage: python benchmarks/stress_bench.py [--frames 60] [--max-count 3000]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import main as game
+from level_stream import Spawn
+
+game.init_display()
+game.bake_halos()
+
+COUNTS = [10, 30, 100, 300, 1000, 3000, 10000]
+NONLINEAR_FACTOR = 1.5  # Marginal cost growth that counts as non-linear
+FIT_POINTS = 3  # Smallest counts the linear cost per entity is fitted over
+FRAME_BUDGET_MS = 1000 / 60
+RESPAWN_SIZE = 30  # Obstacles respawned while timing reuse one size, baked ahead as the game would
+WARMUP_FRAMES = 75  # Enough for the player to turn through every rotation it bakes
+
+
+def background_lines(count):
+    background = game.BackgroundEffect(game.INITIAL_GAME_SPEED, line_count=count, shape_count=0)
+    def frame():
+        background.update(game.INITIAL_GAME_SPEED)
+        background.draw()
+    return frame
+
+
+def background_shapes(count):
+    background = game.BackgroundEffect(game.INITIAL_GAME_SPEED, line_count=0, shape_count=count)
+    def frame():
+        background.update(game.INITIAL_GAME_SPEED)
+        background.draw()
+    return frame
+
+
+def trail(count):
+    player = game.Player(trail_max=max(count, 1))  # The trail always holds the current position
+    for _ in range(count):
+        player.update()
+    def frame():
+        if not player.jumping:
+            player.jump()
+        player.update()
+        player.draw()
+    return frame
+
+
+def obstacles(count):
+    pool = game.ObstaclePool(capacity=count)
+    for i in range(count):
+        pool.spawn(random.uniform(0, game.WIDTH), "rect" if i % 3 else "triangle", game.INITIAL_GAME_SPEED)
+    game.bake_obstacle_sprites([Spawn(0, "rect", RESPAWN_SIZE, RESPAWN_SIZE)])
+    def frame():
+        for _ in range(pool.update(game.INITIAL_GAME_SPEED)):
+            pool.spawn(game.WIDTH, "rect", game.INITIAL_GAME_SPEED, RESPAWN_SIZE, RESPAWN_SIZE)
+        for obstacle in pool:
+            obstacle.draw()
+    return frame
+
+
+def particles(count):
+    system = game.ParticleSystem(game.PARTICLE_COLORS, capacity=count)
+    colors = tuple(range(len(game.PARTICLE_COLORS)))
+    def frame():
+        # Top up whatever died so `count` particles stay live
+        system.burst(game.WIDTH / 2, game.HEIGHT / 2, count - len(system), 8, colors)
+        system.update()
+        system.draw(game.screen)
+    return frame
+
+
+SUBSYSTEMS = {
+    "bg_lines": background_lines,
+    "bg_shapes": background_shapes,
+    "trail": trail,
+    "obstacles": obstacles,
+    "particles": particles,
+}
+
+
+def measure(build, count, frames):
+    """Per-frame milliseconds for `frames` frames of one subsystem at `count` entities"""
+    random.seed(1234)
+    frame = build(count)
+    for _ in range(WARMUP_FRAMES):  # Warm up caches
+        frame()
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        frame()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)
+
+
+def slope(points):
+    """Least squares cost per entity through (count, ms) points, in microseconds"""
+    mean_count = sum(count for count, _ in points) / len(points)
+    mean_ms = sum(ms for _, ms in points) / len(points)
+    spread = sum((count - mean_count) ** 2 for count, _ in points)
+    return sum((count - mean_count) * (ms - mean_ms) for count, ms in points) / spread * 1000
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--max-count", type=int, default=3000)
+    parser.add_argument("--subsystem", action="append", choices=sorted(SUBSYSTEMS))
+    args = parser.parse_args()
+
+    print(f"{'subsystem':<11}{'count':>7}{'mean ms':>9}{'p95 ms':>9}{'us/entity':>11}  note")
+    for name, build in SUBSYSTEMS.items():
+        if args.subsystem and name not in args.subsystem:
+            continue
+        # The frame's fixed cost, which isn't any entity's
+        times = measure(build, 0, args.frames)
+        empty = sum(times) / len(times)
+        print(f"{name:<11}{0:>7}{empty:>9.2f}{times[int(len(times) * 0.95)]:>9.2f}{'':>11}  fixed cost")
+        points = []
+        linear = None
+        limit = None
+        for count in COUNTS:
+            if count > args.max_count:
+                break
+            times = measure(build, count, args.frames)
+            mean = sum(times) / len(times)
+            p95 = times[int(len(times) * 0.95)]
+            note = ""
+            if len(points) < FIT_POINTS:
+                per_entity = (mean - empty) / count * 1000
+            else:
+                # Cost of each extra entity between this step and the last one
+                per_entity = (mean - points[-1][1]) / (count - points[-1][0]) * 1000
+                if linear is None:
+                    linear = slope(points)
+                    note = f"linear cost {linear:.2f} us/entity, fitted over the counts above"
+                if linear <= 0:
+                    note = note or "too cheap to fit a cost per entity"
+                elif per_entity > linear * NONLINEAR_FACTOR:
+                    note = f"non-linear ({per_entity / linear:.1f}x marginal cost)"
+            points.append((count, mean))
+            if mean <= FRAME_BUDGET_MS:
+                limit = count
+            print(f"{name:<11}{count:>7}{mean:>9.2f}{p95:>9.2f}{per_entity:>11.2f}  {note}")
+            if mean > 10 * FRAME_BUDGET_MS:
+                print(f"{name:<11}{'':>7}  stopping, one frame takes {mean:.0f} ms")
+                break
+        print(f"{name:<11} largest tested count that fits a 60 fps frame on its own: {limit}\n")
+
+
+if __name__ == "__main__":
+    main()
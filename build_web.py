@@ -0,0 +1,223 @@
+"""Build the pygbag web bundle with the game's audio pre-rendered
+
+Usage: python build_web.py [--prerender-only] [--output sounds/prerendered] [--no-pygbag]
+
+The sound effects and music loop are synthesized once here, encoded to OGG
+(with ffmpeg or oggenc, whichever is installed; WAV is shipped without
+either) and listed in a manifest. The game loads those files instead of
+running the synthesis loops at page load, synthesizes only what the
+manifest lacks, and a beat map of the music (music_analysis.py, when numpy
+is installed) ships next to it. --prerender-only stops there, which also
+speeds up desktop runs.
+
+Only the modules main-pygbag.py imports and the critical jump and crash
+sounds go into the bundle. The music and the other sounds are served next
+to index.html under assets/ and streamed in after the first frame while a
+small loading bar shows in the corner. The build prints the bundled and
+streamed size of each asset category.
+
+The stage is seeded with pygbag's download cache in build/web-cache, so
+with pygbag 0.9.2, the version that filled it, the build works offline.
+"""
+import json
+import modulefinder
+import os
+import random
+import shutil
+import subprocess
+import sys
+import wave
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from beat_map import EXTENSION as BEAT_MAP_EXTENSION
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# pygbag names the bundle after the folder it builds, and index.html expects this name
+STAGE_DIR = os.path.join(ROOT, "build", "stage", "amazon_q_cli_challenge")
+# Streamed sounds are kept out of the bundle and copied to build/web/assets
+DEFERRED_DIR = os.path.join(ROOT, "build", "stage", "assets")
+ENTRY_POINT = "main-pygbag.py"
+# pygbag's download cache of its template and runtime, and the pygbag version
+# that filled it (pygbag empties a cache another version filled), kept so the
+# build works offline
+CACHE_FILES = ("web-cache", "version.txt")
+OGG_QUALITY = 4
+
+
+def write_wav(path, samples, sample_rate, channels):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples)
+
+
+def encode_ogg(wav_path):
+    """Encode next to the WAV and return the OGG path, or None if no encoder is installed"""
+    ogg_path = os.path.splitext(wav_path)[0] + ".ogg"
+    if shutil.which("ffmpeg"):
+        command = ["ffmpeg", "-y", "-loglevel", "error", "-i", wav_path,
+                   "-c:a", "libvorbis", "-q:a", str(OGG_QUALITY), ogg_path]
+    elif shutil.which("oggenc"):
+        command = ["oggenc", "--quiet", "-q", str(OGG_QUALITY), "-o", ogg_path, wav_path]
+    else:
+        return None
+    subprocess.run(command, check=True)
+    return ogg_path
+
+
+def write_beat_map(wav_path):
+    """Analyse the music next to where it is encoded, so the game knows its beats"""
+    try:
+        import music_analysis
+    except ImportError:
+        print("warning: numpy is not installed, the music ships without a beat map")
+        return
+    music_analysis.analyse_file(wav_path)
+
+
+def prerender(output_dir):
+    """Synthesize every sound into `output_dir` and write its manifest.json"""
+    sys.path.insert(0, ROOT)
+    import main as game
+
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    sample_rate, _, channels = pygame.mixer.get_init()
+    os.makedirs(output_dir, exist_ok=True)
+    random.seed(0)  # The crash noise is random; keep rebuilds byte-identical
+
+    # The game hands its sound effect buffers straight to the mixer, which
+    # reads them as interleaved frames in its own format; write them with the
+    # same layout so the files sound exactly like the synthesized versions.
+    # The music loop goes through mixer.music as a mono WAV.
+    sounds = game.SoundManager()
+    rendered = [(name, sounds.synthesize(name), game.SFX_VOLUMES[name], "sfx", sample_rate, channels)
+                for name in game.SFX_VOLUMES]
+    rendered.append(("music_loop", sounds.music_samples(), 0.5, "music", game.MUSIC_SAMPLE_RATE, 1))
+
+    assets = {}
+    missing_encoder = False
+    for name, samples, volume, kind, rate, layout in rendered:
+        wav_path = os.path.join(output_dir, name + ".wav")
+        write_wav(wav_path, samples, rate, layout)
+        if kind == "music":
+            write_beat_map(wav_path)
+        path = encode_ogg(wav_path)
+        if path is None:
+            missing_encoder = True
+            path = wav_path
+        else:
+            os.remove(wav_path)
+        assets[name] = {
+            "file": os.path.basename(path),
+            "kind": kind,
+            "volume": volume,
+            "bytes": os.path.getsize(path),
+            "deferred": name not in game.CRITICAL_SOUNDS,
+        }
+    if missing_encoder:
+        print("warning: neither ffmpeg nor oggenc found, shipping uncompressed WAV")
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump({"version": 1, "sample_rate": sample_rate, "channels": channels,
+                   "assets": assets}, f, indent=2)
+    for name, entry in assets.items():
+        print(f"  {entry['file']:<18}{entry['bytes'] / 1024:>8.1f} KB")
+    return assets
+
+
+def runtime_modules():
+    """Repository modules the web entry point imports, directly or indirectly"""
+    finder = modulefinder.ModuleFinder(path=[ROOT])
+    finder.run_script(os.path.join(ROOT, ENTRY_POINT))
+    return sorted(module.__file__ for name, module in finder.modules.items()
+                  if module.__file__ and os.path.dirname(os.path.abspath(module.__file__)) == ROOT
+                  and name != "__main__")
+
+
+def stage():
+    """Fill STAGE_DIR with what the bundle needs and DEFERRED_DIR with what streams in later"""
+    shutil.rmtree(os.path.dirname(STAGE_DIR), ignore_errors=True)
+    os.makedirs(STAGE_DIR)
+    os.makedirs(DEFERRED_DIR)
+    for name in CACHE_FILES:
+        path = os.path.join(ROOT, "build", name)
+        if os.path.isdir(path):
+            shutil.copytree(path, os.path.join(STAGE_DIR, "build", name))
+        elif os.path.isfile(path):
+            shutil.copy(path, os.path.join(STAGE_DIR, "build", name))
+    # pygbag only creates its output folder along with a fresh cache
+    os.makedirs(os.path.join(STAGE_DIR, "build", "web"), exist_ok=True)
+    shutil.copy(os.path.join(ROOT, ENTRY_POINT), os.path.join(STAGE_DIR, "main.py"))
+    for path in runtime_modules():
+        shutil.copy(path, STAGE_DIR)
+    sounds_dir = os.path.join(STAGE_DIR, "sounds", "prerendered")
+    for entry in prerender(sounds_dir).values():
+        if entry["deferred"]:
+            shutil.move(os.path.join(sounds_dir, entry["file"]), DEFERRED_DIR)
+
+
+def size_report():
+    """Bytes per asset category, split into what is bundled and what streams"""
+    categories = {}
+    for folder, shipped in ((STAGE_DIR, "bundle"), (DEFERRED_DIR, "streamed")):
+        for directory, subdirs, files in os.walk(folder):
+            subdirs[:] = [d for d in subdirs if d != "build"]
+            for name in files:
+                if name.endswith(".py"):
+                    category = "code"
+                elif name.endswith(".json"):
+                    category = "manifest"
+                elif name.endswith(BEAT_MAP_EXTENSION):
+                    category = "beat map"
+                elif shipped == "bundle":
+                    category = "critical audio"
+                else:
+                    category = "deferred audio"
+                key = (shipped, category)
+                categories[key] = categories.get(key, 0) + os.path.getsize(os.path.join(directory, name))
+
+    print(f"{'where':<10}{'category':<16}{'KB':>9}")
+    for (shipped, category), size in sorted(categories.items()):
+        print(f"{shipped:<10}{category:<16}{size / 1024:>9.1f}")
+    for shipped in ("bundle", "streamed"):
+        total = sum(size for (where, _), size in categories.items() if where == shipped)
+        print(f"{shipped:<10}{'total':<16}{total / 1024:>9.1f}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 2)[2],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prerender-only", action="store_true",
+                        help="only write the pre-rendered sounds (default: into sounds/prerendered)")
+    parser.add_argument("--output", default=os.path.join(ROOT, "sounds", "prerendered"))
+    parser.add_argument("--no-pygbag", action="store_true", help="stage the files but don't run pygbag")
+    args = parser.parse_args()
+
+    if args.prerender_only:
+        prerender(args.output)
+        return
+
+    stage()
+    print(f"Staged {len(os.listdir(STAGE_DIR))} entries in {STAGE_DIR}")
+    size_report()
+    if args.no_pygbag:
+        return
+    subprocess.run([sys.executable, "-m", "pygbag", "--build", STAGE_DIR], check=True)
+    output = os.path.join(ROOT, "build", "web")
+    shutil.copytree(os.path.join(STAGE_DIR, "build", "web"), output, dirs_exist_ok=True)
+    shutil.copytree(DEFERRED_DIR, os.path.join(output, "assets"), dirs_exist_ok=True)
+    for name in sorted(os.listdir(output)):
+        if name.endswith(".apk"):
+            print(f"{name}: {os.path.getsize(os.path.join(output, name)) / 1024:.1f} KB")
+    print(f"Web build written to {output}")
+
+
+if __name__ == "__main__":
+    main()
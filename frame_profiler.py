@@ -0,0 +1,113 @@
+"""Per-phase frame timings with an on-screen overlay"""
+import time
+
+import pygame
+
+
+class FrameProfiler:
+    """Times named phases of each frame into fixed-size ring buffers
+
+    Every call returns straight away while the profiler is disabled, so the
+    marks can stay in the main loop permanently.
+    """
+    def __init__(self, history=240, refresh_frames=15):
+        self.enabled = False
+        self.history = history
+        self.refresh_frames = refresh_frames
+        self.phases = {}  # phase name -> ring buffer of milliseconds
+        self.frame_times = [0.0] * history
+        self.index = 0
+        self.filled = 0
+        self.frame_start = 0.0
+        self.last_mark = 0.0
+        self.font = None
+        self.rendered = []
+        self.frames_since_refresh = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        # Start from a clean slate so stale samples don't skew the numbers
+        self.phases = {}
+        self.frame_times = [0.0] * self.history
+        self.index = 0
+        self.filled = 0
+        self.frame_start = 0.0
+        self.rendered = []
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start:
+            self.frame_times[self.index] = (now - self.frame_start) * 1000
+            self.index = (self.index + 1) % self.history
+            self.filled = min(self.filled + 1, self.history)
+        self.frame_start = self.last_mark = now
+
+    def mark(self, phase):
+        """Attribute the time since the previous mark to `phase`"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        samples = self.phases.get(phase)
+        if samples is None:
+            samples = self.phases[phase] = [0.0] * self.history
+        samples[self.index] = (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def stats(self, samples):
+        """Mean, 95th percentile and max of the filled part of a ring buffer"""
+        if not self.filled:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(samples[:self.filled] if self.filled < self.history else samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return sum(ordered) / len(ordered), p95, ordered[-1]
+
+    def _render_text(self, extra_lines):
+        if self.font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self.font = pygame.font.SysFont(None, 18)
+        lines = [f"{'phase':<11}{'mean':>7}{'p95':>7}{'max':>7}  ms"]
+        for phase, samples in self.phases.items():
+            mean, p95, worst = self.stats(samples)
+            lines.append(f"{phase:<11}{mean:>7.2f}{p95:>7.2f}{worst:>7.2f}")
+        mean, p95, worst = self.stats(self.frame_times)
+        lines.append(f"{'frame':<11}{mean:>7.2f}{p95:>7.2f}{worst:>7.2f}")
+        lines.extend(extra_lines)
+        self.rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+
+    def draw(self, surface, extra_lines=()):
+        """Draw the stats table and a frame-time graph in the top right corner"""
+        if not self.enabled:
+            return
+        # Text is only re-rendered every few frames, the graph every frame
+        self.frames_since_refresh += 1
+        if not self.rendered or self.frames_since_refresh >= self.refresh_frames:
+            self._render_text(extra_lines)
+            self.frames_since_refresh = 0
+
+        line_height = 14
+        graph_height = 50
+        width = max(text.get_width() for text in self.rendered) + 10
+        width = max(width, self.history // 2 + 10)
+        height = len(self.rendered) * line_height + graph_height + 15
+        left = surface.get_width() - width - 10
+        top = 40
+
+        panel = pygame.Rect(left, top, width, height)
+        surface.fill((0, 0, 0), panel)
+        for i, text in enumerate(self.rendered):
+            surface.blit(text, (left + 5, top + 5 + i * line_height))
+
+        # Frame-time graph, oldest sample on the left, with a 60 fps guide line
+        graph_bottom = top + height - 5
+        scale = graph_height / 33.3
+        budget_y = graph_bottom - int(16.7 * scale)
+        pygame.draw.line(surface, (80, 80, 80), (left + 5, budget_y), (left + width - 5, budget_y))
+        for i in range(0, self.filled, 2):
+            sample = self.frame_times[(self.index - self.filled + i) % self.history]
+            x = left + 5 + i // 2
+            bar = min(int(sample * scale), graph_height)
+            color = (0, 255, 128) if sample <= 17.5 else (255, 0, 128)
+            pygame.draw.line(surface, color, (x, graph_bottom), (x, graph_bottom - bar))
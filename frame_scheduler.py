@@ -0,0 +1,81 @@
+"""Frame pacing and a pausable game clock shared by the desktop and web builds"""
+import asyncio
+import sys
+import time
+
+import pygame
+
+WEB = sys.platform == "emscripten"
+
+
+def page_hidden():
+    """True while the browser tab is in the background; always False off the web"""
+    if not WEB:
+        return False
+    try:
+        import platform  # pygbag's platform module exposes the JavaScript window
+        return bool(platform.window.document.hidden)
+    except Exception:
+        return False
+
+
+class FrameScheduler:
+    """Paces the main loop and keeps a game clock that stops while the game is hidden
+
+    On the desktop frames are paced with pygame's Clock. In the browser pygbag
+    already steps the asyncio loop once per animation frame, so ticking a
+    Clock as well would pace every frame twice; yielding is enough there.
+    Game time only advances while the window is visible and focused, and by
+    at most `max_step_ms` per frame, so a stall doesn't fast-forward the game.
+    With `catch_up` set stalls count in full instead, so game time keeps
+    pace with the music when the level is timed to it.
+    """
+    def __init__(self, fps=60, max_step_ms=100, idle_fps=10):
+        self.fps = fps
+        self.max_step_ms = max_step_ms
+        self.idle_fps = idle_fps  # Desktop frame rate while paused, to stay off the CPU
+        self.clock = pygame.time.Clock()
+        self.game_time = 0.0  # Milliseconds of unpaused play
+        self.unfocused = False
+        self.minimized = False
+        self.hidden = False
+        self.catch_up = False  # Let stalls through uncapped
+        self.stalls = 0  # Frames whose real duration was longer than max_step_ms
+        self.last_frame = time.perf_counter()
+
+    @property
+    def paused(self):
+        return self.unfocused or self.minimized or self.hidden
+
+    def now(self):
+        """Game time in milliseconds, the replacement for pygame.time.get_ticks()"""
+        return int(self.game_time)
+
+    def handle_event(self, event):
+        """Track window focus and minimising"""
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.unfocused = True
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.unfocused = False
+        elif event.type == pygame.WINDOWMINIMIZED:
+            self.minimized = True
+        elif event.type == pygame.WINDOWRESTORED:
+            self.minimized = False
+
+    async def next_frame(self):
+        """Wait for the next frame, then advance game time by the (capped) frame duration"""
+        if not WEB:
+            self.clock.tick(self.idle_fps if self.paused else self.fps)
+        await asyncio.sleep(0)
+
+        now = time.perf_counter()
+        elapsed = (now - self.last_frame) * 1000
+        self.last_frame = now
+        self.hidden = page_hidden()
+        if self.paused:
+            return
+        if elapsed > self.max_step_ms:
+            self.stalls += 1
+            if not self.catch_up:
+                elapsed = self.max_step_ms
+        self.game_time += elapsed
@@ -0,0 +1,62 @@
+"""Present a fixed-size framebuffer in a window of any size"""
+import pygame
+
+SCALE_MODES = ("integer", "smooth")
+
+
+class Presenter:
+    """Copies the framebuffer to the window with one scaled blit
+
+    "integer" scales by the largest whole factor that fits (nearest neighbour,
+    crisp pixels) and "smooth" fills as much of the window as the aspect ratio
+    allows with filtered scaling. Either way the picture is centred and the
+    bars around it are cleared. The layout is only recomputed when the window
+    size changes, and the scaled image is written straight into the window.
+    The window subsurface is taken afresh every frame because SDL replaces
+    the window's pixels when it is resized.
+    """
+    def __init__(self, framebuffer, mode="smooth"):
+        if mode not in SCALE_MODES:
+            raise ValueError(f"unknown scale mode {mode!r}")
+        self.framebuffer = framebuffer
+        self.mode = mode
+        self.window = None
+        self.window_size = None
+        self.rect = None  # Where the picture goes in the window
+        self.bars = []
+
+    def _layout(self, window):
+        width, height = self.framebuffer.get_size()
+        window_width, window_height = window.get_size()
+        factor = min(window_width / width, window_height / height)
+        if self.mode == "integer" and factor >= 1:
+            factor = int(factor)
+        size = (max(1, int(width * factor)), max(1, int(height * factor)))
+        rect = pygame.Rect((0, 0), size)
+        rect.center = (window_width // 2, window_height // 2)
+        self.rect = rect
+        # Up to four bars around the picture, cleared every frame
+        self.bars = [bar for bar in (
+            pygame.Rect(0, 0, window_width, rect.top),
+            pygame.Rect(0, rect.bottom, window_width, window_height - rect.bottom),
+            pygame.Rect(0, rect.top, rect.left, rect.height),
+            pygame.Rect(rect.right, rect.top, window_width - rect.right, rect.height),
+        ) if bar.width > 0 and bar.height > 0]
+        self.window = window
+        self.window_size = window.get_size()
+
+    def present(self, window):
+        """Draw the framebuffer into `window`; the caller flips the display"""
+        if window.get_size() == self.framebuffer.get_size():
+            window.blit(self.framebuffer, (0, 0))
+            return
+        if window is not self.window or window.get_size() != self.window_size:
+            self._layout(window)
+        for bar in self.bars:
+            window.fill((0, 0, 0), bar)
+        if self.rect.size == self.framebuffer.get_size():
+            window.blit(self.framebuffer, self.rect)
+        elif self.mode == "smooth" and window.get_bitsize() >= 24:
+            pygame.transform.smoothscale(self.framebuffer, self.rect.size, window.subsurface(self.rect))
+        else:
+            pygame.transform.scale(self.framebuffer, self.rect.size, window.subsurface(self.rect))
@@ -0,0 +1,179 @@
+"""Ghost runs: a player's height on every tick, stored delta-encoded and compressed
+
+File layout (little endian):
+
+    8s   magic b"CR84GHO\\0"
+    H    format version
+    Q    level seed the run was played on
+    I    number of ticks
+    I    final score
+    f    spawn density multiplier
+    16s  player name, NUL padded
+    48s  level key (level_stream.level_key()), NUL padded
+    ...  zlib stream of zigzag varints, one per tick: change in y (whole pixels)
+
+Standing on the ground is a delta of 0 and every jump repeats the same arc,
+so a ten minute run compresses to a few KB. Playback decompresses the file
+a chunk at a time as the ghost advances instead of loading it up front.
+"""
+import os
+import struct
+import zlib
+
+MAGIC = b"CR84GHO\0"
+VERSION = 2
+HEADER = struct.Struct("<8sHQIIf16s48s")
+NAME_SIZE = 16
+LEVEL_KEY_SIZE = 48
+EXTENSION = ".cr84g"
+
+
+class GhostRecorder:
+    """Collects one run's trajectory as varint deltas while it is played"""
+    def __init__(self, seed, spawn_density=1.0, name="player", level_key=""):
+        self.seed = seed
+        self.spawn_density = spawn_density
+        self.name = name
+        self.level_key = level_key
+        self.deltas = bytearray()
+        self.ticks = 0
+        self.last_y = 0
+
+    def record(self, y):
+        y = round(y)
+        delta = y - self.last_y
+        self.last_y = y
+        value = (delta << 1) ^ (delta >> 63)  # Zigzag, so small negatives stay small
+        while value > 0x7F:
+            self.deltas.append(value & 0x7F | 0x80)
+            value >>= 7
+        self.deltas.append(value)
+        self.ticks += 1
+
+    def save(self, path, score):
+        """Write the run; returns the file size in bytes"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        name = self.name.encode("utf-8")[:NAME_SIZE]
+        level_key = self.level_key.encode("utf-8")[:LEVEL_KEY_SIZE]
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.ticks, score,
+                                self.spawn_density, name, level_key))
+            f.write(zlib.compress(bytes(self.deltas), 9))
+            return f.tell()
+
+
+def read_header(path):
+    """(seed, ticks, score, spawn density, name, level key) without touching the trajectory"""
+    with open(path, "rb") as f:
+        return _unpack_header(f, path)
+
+
+def _unpack_header(f, path):
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a ghost file")
+    magic, version, seed, ticks, score, density, name, level_key = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a ghost file")
+    if version != VERSION:
+        raise ValueError(f"{path} was recorded by another version of the game")
+    return (seed, ticks, score, density, name.rstrip(b"\0").decode("utf-8", "replace"),
+            level_key.rstrip(b"\0").decode("utf-8", "ignore"))
+
+
+class Ghost:
+    """Plays a ghost file back one tick at a time, reading the file in chunks
+
+    `ground_y` is the player's y when standing, used to tell when the ghost
+    is in the air so it can spin like the player does.
+    """
+    def __init__(self, path, ground_y, chunk_size=1024):
+        self.path = path
+        self.ground_y = ground_y
+        self.chunk_size = chunk_size
+        self.file = open(path, "rb")
+        (self.seed, self.ticks, self.score, self.spawn_density,
+         self.name, self.level_key) = _unpack_header(self.file, path)
+        self.positions = self._trajectory()
+        self.y = None
+        self.air_ticks = 0
+        self.finished = False
+
+    def _trajectory(self):
+        decoder = zlib.decompressobj()
+        y = value = shift = 0
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            try:
+                data = decoder.decompress(chunk) if chunk else decoder.flush()
+            except zlib.error as e:
+                # Only the header is checked up front, so a damaged run just ends here
+                print(f"Ghost {self.path} is damaged, stopping it: {e}")
+                return
+            for byte in data:
+                value |= (byte & 0x7F) << shift
+                if byte & 0x80:
+                    shift += 7
+                    continue
+                y += (value >> 1) ^ -(value & 1)
+                yield y
+                value = shift = 0
+            if not chunk:
+                return
+
+    def advance(self):
+        """Step to the next tick; the ghost is finished once its run ended"""
+        if self.finished:
+            return
+        self.y = next(self.positions, None)
+        if self.y is None:
+            self.finished = True
+            self.close()
+        elif self.y < self.ground_y:
+            self.air_ticks += 1
+        else:
+            self.air_ticks = 0
+
+    def close(self):
+        self.positions.close()
+        self.file.close()
+
+
+def find_ghosts(directory="ghosts", extra=()):
+    """The `extra` paths followed by the ghost files in `directory`, personal best first"""
+    paths = list(dict.fromkeys(extra))
+    if os.path.isdir(directory):
+        names = sorted(name for name in os.listdir(directory) if name.endswith(EXTENSION))
+        if "best" + EXTENSION in names:
+            names.remove("best" + EXTENSION)
+            names.insert(0, "best" + EXTENSION)
+        paths += [path for path in (os.path.join(directory, name) for name in names) if path not in paths]
+    return paths
+
+
+def load_ghosts(paths, ground_y, seed=None, level_key="", limit=20):
+    """Open up to `limit` ghosts recorded on `seed` (or on the first ghost's seed)
+
+    Only ghosts whose level was generated with `level_key` are considered, as
+    the same seed lays out another level under other settings. Returns
+    (seed, ghosts); seed is None when there was nothing to load.
+    """
+    ghosts = []
+    level_key = level_key.encode("utf-8")[:LEVEL_KEY_SIZE].decode("utf-8", "ignore")  # As stored
+    for path in paths:
+        if len(ghosts) >= limit:
+            break
+        try:
+            header = read_header(path)
+        except (OSError, ValueError) as e:
+            print(f"Skipping ghost: {e}")
+            continue
+        if header[5] != level_key:
+            continue
+        if seed is None:
+            seed = header[0]
+        if header[0] == seed:
+            ghosts.append(Ghost(path, ground_y))
+    return seed, ghosts
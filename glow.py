@@ -0,0 +1,161 @@
+"""Soft neon glows from halo textures blurred once and added onto the frame
+
+A halo is the silhouette of a sprite or a line of text, tinted and
+blurred, with black everywhere the glow doesn't reach. It is drawn with
+BLEND_ADD, so it brightens whatever lies beneath it instead of covering it,
+and black pixels cost nothing visible. Each halo is baked once as a ladder
+of brightness steps; a pulsing glow picks a step per frame rather than
+drawing anything.
+
+The blur is three passes of a box filter along each axis, which is close
+to a Gaussian, run on the alpha channel with numpy through surfarray.
+Without numpy the tinted silhouette is shrunk and smoothly scaled back up,
+which blurs less evenly but needs nothing beyond pygame.
+"""
+import math
+from collections import OrderedDict
+from functools import lru_cache
+
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LEVELS = 6        # Brightness steps in a halo's ladder
+BOX_PASSES = 3    # Box blurs per axis; three already look Gaussian
+
+
+def _box_blur(coverage, radius):
+    """Average over (2 * radius + 1) pixels along each axis, BOX_PASSES times, with zeros outside"""
+    window = 2 * radius + 1
+    for _ in range(BOX_PASSES):
+        for axis in (0, 1):
+            padding = [(0, 0), (0, 0)]
+            padding[axis] = (radius + 1, radius)
+            sums = numpy.cumsum(numpy.pad(coverage, padding), axis=axis)
+            if axis == 0:
+                coverage = (sums[window:] - sums[:-window]) / window
+            else:
+                coverage = (sums[:, window:] - sums[:, :-window]) / window
+    return coverage
+
+
+def _coverage(shape):
+    """How much of each pixel the shape covers, from 0 to 1, as a numpy array indexed [x, y]"""
+    if shape.get_flags() & pygame.SRCALPHA:
+        return pygame.surfarray.array_alpha(shape).astype(numpy.float32) / 255
+    if shape.get_colorkey() is not None:
+        return pygame.surfarray.array_colorkey(shape).astype(numpy.float32) / 255
+    return numpy.ones(shape.get_size(), numpy.float32)
+
+
+def _blurred_halo(shape, color, radius, strength):
+    """The tinted and blurred silhouette of `shape`, `radius` pixels larger on every side"""
+    width, height = shape.get_size()
+    size = (width + 2 * radius, height + 2 * radius)
+    if numpy is not None:
+        coverage = numpy.zeros(size, numpy.float32)
+        coverage[radius:radius + width, radius:radius + height] = _coverage(shape)
+        # Three passes of half-width b blur like a Gaussian with a standard
+        # deviation of sqrt(b * (b + 1)), which puts the tail at `radius`
+        coverage = _box_blur(coverage, max(1, round(radius / 2.5))) * strength
+        rgb = numpy.minimum(coverage[:, :, None] * numpy.array(color, numpy.float32), 255)
+        halo = pygame.Surface(size)
+        pygame.surfarray.blit_array(halo, rgb.astype(numpy.uint8))
+        return halo
+    halo = pygame.Surface(size)
+    halo.fill((0, 0, 0))
+    silhouette = pygame.mask.from_surface(shape).to_surface(setcolor=color, unsetcolor=(0, 0, 0))
+    halo.blit(silhouette, (radius, radius))
+    scale = max(1, radius // 2)
+    small = pygame.transform.smoothscale(halo, (max(1, size[0] // scale), max(1, size[1] // scale)))
+    halo = pygame.transform.smoothscale(small, size)
+    # Scale by strength as a fraction and then add whole copies
+    copies = math.ceil(strength)
+    level = int(255 * strength / copies)
+    halo.fill((level, level, level), special_flags=pygame.BLEND_MULT)
+    layer = halo.copy()
+    for _ in range(copies - 1):
+        halo.blit(layer, (0, 0), special_flags=pygame.BLEND_ADD)
+    return halo
+
+
+def bake_halo(shape, color, radius, strength=2.0, low=1.0, levels=LEVELS):
+    """A ladder of `levels` halos around `shape`, brightest last
+
+    Just outside the shape's edge the brightest halo is `strength` times
+    half the colour, clipped to full brightness, and it fades out by
+    `radius` pixels. The dimmest step is `low` times as bright as the
+    brightest. Blit a step at the shape's position minus `radius` with
+    special_flags=BLEND_ADD.
+    """
+    halo = _blurred_halo(shape, color, radius, strength)
+    ladder = []
+    for step in range(levels):
+        brightness = low + (1 - low) * step / max(1, levels - 1)
+        rung = halo.copy()
+        if brightness < 1:
+            level = int(255 * brightness)
+            rung.fill((level, level, level), special_flags=pygame.BLEND_MULT)
+        ladder.append(rung)
+    return tuple(ladder)
+
+
+def pulse_step(phase, levels=LEVELS):
+    """The ladder step for a pulse at `phase` radians, dimmest at -pi/2 and brightest at pi/2"""
+    return int((levels - 1) * 0.5 * (1 + math.sin(phase)) + 0.5)
+
+
+@lru_cache(maxsize=None)
+def _ramp(color, strength, brightness):
+    """256 palette entries from black up to `strength` times `color`, clipped and then dimmed"""
+    return [tuple(int(min(channel * strength * level / 255, 255) * brightness) for channel in color)
+            for level in range(256)]
+
+
+class IndexedHalo:
+    """A halo ladder on 8-bit surfaces, recoloured through their palettes
+
+    Each pixel holds how much of the colour it glows with, so a halo drawn
+    in a new colour rewrites the palette of the step being drawn instead of
+    blurring the silhouette again. Each step keeps the colour it was last
+    drawn in, so an unchanged colour costs nothing. It looks the same as
+    bake_halo()'s ladder in that colour.
+    """
+    def __init__(self, shape, radius, strength=2.0, low=1.0, levels=LEVELS):
+        coverage = _blurred_halo(shape, (255, 255, 255), radius, 1.0)
+        pixels = pygame.image.tobytes(coverage, "RGB")[::3]
+        self.steps = [pygame.image.frombytes(pixels, coverage.get_size(), "P") for _ in range(levels)]
+        self.strength = strength
+        self.brightness = [low + (1 - low) * step / max(1, levels - 1) for step in range(levels)]
+        self.colors = [None] * levels
+
+    def step(self, step, color):
+        """Step `step` of the ladder in `color`"""
+        surface = self.steps[step]
+        if self.colors[step] != color:
+            self.colors[step] = color
+            surface.set_palette(_ramp(tuple(color), self.strength, self.brightness[step]))
+        return surface
+
+
+class HaloCache:
+    """Halo ladders by caller-chosen key, with the least recently used dropped past `capacity`"""
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.ladders = OrderedDict()
+
+    def get(self, key, shape, color, radius, strength=2.0, low=1.0):
+        ladder = self.ladders.get(key)
+        if ladder is not None:
+            self.ladders.move_to_end(key)
+            return ladder
+        ladder = self.ladders[key] = bake_halo(shape, color, radius, strength, low)
+        if len(self.ladders) > self.capacity:
+            self.ladders.popitem(last=False)
+        return ladder
+
+    def clear(self):
+        self.ladders.clear()
@@ -0,0 +1,131 @@
+"""Persistent high scores in SQLite, written in batches off the render thread
+
+Every leaderboard query walks one index in score order and stops after N
+rows, so it costs the same with a thousand stored runs as with millions.
+`python benchmarks/highscore_bench.py` checks that.
+"""
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    day TEXT NOT NULL,          -- Local date, YYYY-MM-DD
+    played_at REAL NOT NULL,    -- Unix time
+    seed INTEGER NOT NULL,
+    duration REAL NOT NULL,     -- Seconds survived
+    level TEXT NOT NULL DEFAULT ''  -- level_stream.level_key(): how the seed was laid out
+);
+CREATE INDEX IF NOT EXISTS runs_by_score ON runs (score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_day ON runs (day, score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_level ON runs (seed, level, score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_player ON runs (player, score DESC);
+"""
+
+INSERT = ("INSERT INTO runs (player, score, day, played_at, seed, duration, level) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?)")
+COLUMNS = "player, score, day, seed, duration"
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    # WAL lets the game read the leaderboard while the writer commits
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(runs)")]
+    if columns and "level" not in columns:
+        # A database from before runs recorded their level; its runs match no level
+        connection.execute("ALTER TABLE runs ADD COLUMN level TEXT NOT NULL DEFAULT ''")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class HighScoreStore:
+    """Queues finished runs for a writer thread and answers leaderboard queries
+
+    Browsers can't start threads, so under pygbag each run is written as it
+    is added instead.
+    """
+    def __init__(self, path="highscores.sqlite3", batch_size=64, flush_interval=0.5):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.reader = connect(path)
+        self.pending = queue.Queue()
+        self.threaded = sys.platform != "emscripten"
+        self.writer = None
+        if self.threaded:
+            self.writer = threading.Thread(target=self._write_loop, name="highscores", daemon=True)
+            self.writer.start()
+
+    def add(self, player, score, seed, duration, level="", played_at=None):
+        """Record a finished run; returns straight away"""
+        played_at = time.time() if played_at is None else played_at
+        day = time.strftime("%Y-%m-%d", time.localtime(played_at))
+        row = (player, score, day, played_at, seed, duration, level)
+        if self.threaded:
+            self.pending.put(row)
+        else:
+            with self.reader:
+                self.reader.execute(INSERT, row)
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        while True:
+            row = self.pending.get()
+            if row is None:
+                break
+            batch = [row]
+            # Gather whatever else arrives shortly after, then commit once
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    row = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    self.pending.put(None)
+                    break
+                batch.append(row)
+            with connection:
+                connection.executemany(INSERT, batch)
+        connection.close()
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        if self.writer is not None and self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+        self.reader.close()
+
+    def _query(self, where, parameters, n):
+        return self.reader.execute(
+            f"SELECT {COLUMNS} FROM runs {where} ORDER BY score DESC LIMIT ?",
+            (*parameters, n)).fetchall()
+
+    def top(self, n=10):
+        """Best runs of all time as (player, score, day, seed, duration) rows"""
+        return self._query("", (), n)
+
+    def top_for_day(self, day=None, n=10):
+        """Best runs on `day` (YYYY-MM-DD, default today)"""
+        return self._query("WHERE day = ?", (day or time.strftime("%Y-%m-%d"),), n)
+
+    def top_for_level(self, seed, level="", n=10):
+        """Best runs on the level generated from `seed` with the settings in `level`"""
+        return self._query("WHERE seed = ? AND level = ?", (seed, level), n)
+
+    def top_for_player(self, player, n=10):
+        return self._query("WHERE player = ?", (player,), n)
+
+    def count(self):
+        return self.reader.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
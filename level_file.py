@@ -0,0 +1,219 @@
+"""Compact binary level files, streamed chunk by chunk through mmap
+
+File layout (little endian):
+
+    8s   magic b"CR84LVL\\0"
+    H    format version
+    H    bytes per obstacle record
+    I    number of obstacles
+    I    chunk length in scroll distance
+    I    number of chunks
+    Q    level seed (identifies the level for ghosts and high scores)
+    ...  obstacle records sorted by position:
+         I position in 1/16 pixel, B shape (index into obstacle_types.TYPE_NAMES),
+         B width, B height, 1 pad byte
+    I    chunk index, once per chunk plus one: first record of each chunk
+
+LevelFile only decodes the chunks just ahead of the scroll position, so an
+hour-long level costs the same memory as a short one. The text form,
+compiled with `python level_file.py compile level.txt level.cr84l`, is one
+obstacle per line:
+
+    # comment
+    seed 42
+    chunk_length 4000
+    1200 rect 30 50
+    1650 triangle 35
+    2100 floating 60 20
+
+Shape names are the keys of obstacle_types.OBSTACLE_TYPES.
+"""
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections import deque
+
+from level_stream import DIFFICULTY_CURVES, PATTERN_SETS, LevelStream, Spawn
+from obstacle_types import TYPE_NAMES
+
+MAGIC = b"CR84LVL\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIIIQ")
+RECORD = struct.Struct("<IBBBx")
+INDEX = struct.Struct("<I")
+POSITION_SCALE = 16
+SHAPES = TYPE_NAMES  # Indexed by the shape byte
+
+
+def write_level(path, spawns, seed=0, chunk_length=4000):
+    """Write spawns (already sorted by position) and return the obstacle count
+
+    Records are streamed to the file, so a generator covering an hour of
+    play never has to be held in memory; only the chunk index is.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    shape_codes = {name: code for code, name in enumerate(SHAPES)}
+    index = []
+    count = 0
+    last_position = 0
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER.size))  # Filled in once the counts are known
+        for spawn in spawns:
+            position = round(spawn.position * POSITION_SCALE)
+            if position < last_position:
+                raise ValueError(f"spawn at {spawn.position} is out of order")
+            while len(index) <= position // (chunk_length * POSITION_SCALE):
+                index.append(count)
+            f.write(RECORD.pack(position, shape_codes[spawn.shape_type], spawn.width, spawn.height))
+            last_position = position
+            count += 1
+        index.append(count)
+        for first in index:
+            f.write(INDEX.pack(first))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, chunk_length, len(index) - 1, seed))
+    return count
+
+
+class LevelFile:
+    """Feeds spawns from a level file with the same interface as LevelStream"""
+    def __init__(self, path, lookahead_chunks=2):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{path} is not a level file")
+        magic, version, record_size, self.count, self.chunk_length, self.chunks, self.seed = \
+            HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a level file")
+        self.index_offset = HEADER.size + self.count * RECORD.size
+        self.lookahead = self.chunk_length * lookahead_chunks
+        self.pending = deque()
+        self.next_chunk = 0
+        self.generated_to = 0.0
+        while self.generated_to < self.lookahead and self.next_chunk < self.chunks:
+            self._load_chunk()
+
+    def _load_chunk(self):
+        """Decode the records of the next chunk into the pending queue"""
+        first, = INDEX.unpack_from(self.map, self.index_offset + self.next_chunk * INDEX.size)
+        end, = INDEX.unpack_from(self.map, self.index_offset + (self.next_chunk + 1) * INDEX.size)
+        start = HEADER.size + first * RECORD.size
+        for position, shape, width, height in RECORD.iter_unpack(self.map[start:HEADER.size + end * RECORD.size]):
+            self.pending.append(Spawn(position / POSITION_SCALE, SHAPES[shape], width, height))
+        self.next_chunk += 1
+        self.generated_to += self.chunk_length
+
+    def pop_due(self, distance):
+        """Return the next spawn whose position has been reached, or None"""
+        if self.generated_to - distance < self.lookahead and self.next_chunk < self.chunks:
+            self._load_chunk()
+        if self.pending and self.pending[0].position <= distance:
+            return self.pending.popleft()
+        return None
+
+    def peek(self, count=1):
+        """Upcoming spawns without consuming them"""
+        return [self.pending[i] for i in range(min(count, len(self.pending)))]
+
+    def spawns(self):
+        """Every remaining spawn in order, still decoded one chunk at a time"""
+        while self.pending or self.next_chunk < self.chunks:
+            if self.pending:
+                yield self.pending.popleft()
+            else:
+                self._load_chunk()
+
+    def close(self):
+        self.map.close()
+
+
+def parse_text(lines):
+    """Read the text form; returns (seed or None, chunk length, spawns sorted by position)"""
+    seed = None
+    chunk_length = 4000
+    spawns = []
+    for number, line in enumerate(lines, 1):
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        try:
+            if fields[0] == "seed":
+                seed = int(fields[1])
+            elif fields[0] == "chunk_length":
+                chunk_length = int(fields[1])
+            else:
+                position, shape = float(fields[0]), fields[1]
+                if shape not in SHAPES:
+                    raise ValueError(f"unknown shape {shape!r}")
+                width = int(fields[2])
+                height = int(fields[3]) if len(fields) > 3 else width
+                if not (0 < width < 256 and 0 < height < 256):
+                    raise ValueError("sizes must be 1-255")
+                spawns.append(Spawn(position, shape, width, height))
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"line {number}: {e or 'missing field'}") from None
+    spawns.sort(key=lambda spawn: spawn.position)
+    return seed, chunk_length, spawns
+
+
+def compile_text(text_path, level_path):
+    with open(text_path) as f:
+        seed, chunk_length, spawns = parse_text(f)
+    if seed is None:
+        # Authored levels are identified by their content
+        seed = zlib.crc32(repr(spawns).encode())
+    return write_level(level_path, spawns, seed, chunk_length)
+
+
+def dump_text(level_path, out=sys.stdout):
+    level = LevelFile(level_path)
+    out.write(f"seed {level.seed}\nchunk_length {level.chunk_length}\n")
+    for spawn in level.spawns():
+        out.write(f"{spawn.position:g} {spawn.shape_type} {spawn.width} {spawn.height}\n")
+    level.close()
+
+
+def generate(level_path, distance, seed=1, patterns='classic', difficulty='classic'):
+    """Bake `distance` pixels of a LevelStream layout into a level file"""
+    stream = LevelStream(seed, patterns, difficulty)
+
+    def spawns():
+        while stream.peek()[0].position <= distance:
+            yield stream.pop_due(stream.peek()[0].position)
+    return write_level(level_path, spawns(), seed, stream.chunk_length)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build and inspect binary level files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("compile", help="Text level to binary")
+    command.add_argument("text")
+    command.add_argument("level")
+    command = commands.add_parser("dump", help="Binary level to text on stdout")
+    command.add_argument("level")
+    command = commands.add_parser("generate", help="Bake a generated layout into a level file")
+    command.add_argument("level")
+    command.add_argument("--seed", type=int, default=1)
+    command.add_argument("--distance", type=int, default=200000)
+    command.add_argument("--patterns", choices=sorted(PATTERN_SETS), default='classic')
+    command.add_argument("--difficulty", choices=sorted(DIFFICULTY_CURVES), default='classic')
+    args = parser.parse_args()
+
+    try:
+        if args.command == "compile":
+            count = compile_text(args.text, args.level)
+        elif args.command == "generate":
+            count = generate(args.level, args.distance, args.seed, args.patterns, args.difficulty)
+        else:
+            dump_text(args.level)
+            sys.exit(0)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    print(f"{args.level}: {count} obstacles, {os.path.getsize(args.level)} bytes")
@@ -0,0 +1,205 @@
+"""Seeded lookahead generator for obstacle spawns"""
+import random
+from collections import deque, namedtuple
+
+from obstacle_types import OBSTACLE_TYPES, random_size
+
+# Positions are measured in scroll distance (pixels the world has moved), so
+# the layout does not depend on the frame rate the game happens to run at
+Spawn = namedtuple('Spawn', ['position', 'shape_type', 'width', 'height'])
+
+# Game pacing, used by main.py, the beat grid and the autopilot as well:
+# 60 updates per second, +0.5 speed every 15 s up to the speed cap
+TICKS_PER_SECOND = 60
+INITIAL_GAME_SPEED = 5
+MAX_GAME_SPEED = 12
+SPEED_STEP = 0.5
+SPEED_STEP_SECONDS = 15
+MIN_OBSTACLE_DISTANCE = 300
+
+
+def expected_speed(distance, max_speed=MAX_GAME_SPEED):
+    """Game speed the player will have reached after scrolling `distance` pixels"""
+    speed = INITIAL_GAME_SPEED
+    stage_length = speed * TICKS_PER_SECOND * SPEED_STEP_SECONDS
+    while distance >= stage_length and speed < max_speed:
+        distance -= stage_length
+        speed = min(speed + SPEED_STEP, max_speed)
+        stage_length = speed * TICKS_PER_SECOND * SPEED_STEP_SECONDS
+    return speed
+
+
+def classic_difficulty(distance, max_speed=MAX_GAME_SPEED):
+    """Original pacing: 1.5-2.5 seconds between obstacles, 70% rectangles"""
+    speed = expected_speed(distance, max_speed)
+    return {
+        'min_gap': max(MIN_OBSTACLE_DISTANCE, 1.5 * speed * TICKS_PER_SECOND),
+        'max_gap': max(MIN_OBSTACLE_DISTANCE, 2.5 * speed * TICKS_PER_SECOND),
+        'rect_chance': 0.7,
+    }
+
+
+def ramp_difficulty(distance, max_speed=MAX_GAME_SPEED):
+    """Gaps shrink towards 1 second and spikes get more common the further you go"""
+    speed = expected_speed(distance, max_speed)
+    progress = min(distance / 200000, 1.0)
+    return {
+        'min_gap': max(MIN_OBSTACLE_DISTANCE, (1.5 - 0.5 * progress) * speed * TICKS_PER_SECOND),
+        'max_gap': max(MIN_OBSTACLE_DISTANCE, (2.5 - 1.0 * progress) * speed * TICKS_PER_SECOND),
+        'rect_chance': 0.7 - 0.3 * progress,
+    }
+
+
+# A pattern returns obstacles as (offset, shape_type, width, height) relative
+# to the pattern start, plus the length it occupies
+def single_obstacle(rng, difficulty):
+    if rng.random() < difficulty['rect_chance']:
+        width = rng.randint(20, 40)
+        return [(0, "rect", width, rng.randint(20, 60))], width
+    size = rng.randint(20, 40)
+    return [(0, "triangle", size, size)], size
+
+
+def double_spike(rng, difficulty):
+    size = rng.randint(20, 30)
+    return [(0, "triangle", size, size), (size, "triangle", size, size)], size * 2
+
+
+def weighted_obstacle(rng, difficulty):
+    """Any registered obstacle type, picked by its spawn weight"""
+    roll = rng.random() * sum(obstacle_type.weight for obstacle_type in OBSTACLE_TYPES.values())
+    for obstacle_type in OBSTACLE_TYPES.values():
+        roll -= obstacle_type.weight
+        if roll < 0:
+            break
+    width, height = random_size(obstacle_type, rng)
+    return [(0, obstacle_type.name, width, height)], width
+
+
+PATTERN_SETS = {
+    'classic': [(1.0, single_obstacle)],
+    'mixed': [(0.8, single_obstacle), (0.2, double_spike)],
+    'varied': [(0.85, weighted_obstacle), (0.15, double_spike)],
+}
+
+DIFFICULTY_CURVES = {
+    'classic': classic_difficulty,
+    'ramp': ramp_difficulty,
+}
+
+
+def level_key(patterns='classic', spawn_density=1.0, max_speed=MAX_GAME_SPEED, beat_ms=None, beat_offset_ms=0.0):
+    """Everything besides the seed that decides a generated layout, as a short string
+
+    Ghosts and the "this level" leaderboard match runs on the seed and this
+    key, so a run is only compared with runs laid out the same way. `beat_ms`
+    is the beat length when obstacles follow a beat grid.
+    """
+    key = f"{patterns} x{spawn_density:g} max{max_speed:g}"
+    if beat_ms:
+        key += f" beat{beat_ms:.3f}{beat_offset_ms:+.3f}"
+    return key
+
+
+def scale_spawn_density(difficulty, density):
+    """Wrap a difficulty curve so gaps shrink by `density` (2.0 = twice as many obstacles)"""
+    curve = DIFFICULTY_CURVES[difficulty] if isinstance(difficulty, str) else difficulty
+    if density == 1:
+        return curve
+
+    def scaled(distance, max_speed=MAX_GAME_SPEED):
+        params = dict(curve(distance, max_speed))
+        params['min_gap'] /= density
+        params['max_gap'] /= density
+        return params
+    return scaled
+
+
+class LevelStream:
+    """Generates spawns in chunks ahead of the scroll position
+
+    `max_speed` is the game's speed cap, which the difficulty curves use to
+    turn seconds between obstacles into pixels.
+    """
+    def __init__(self, seed=None, patterns='classic', difficulty='classic',
+                 chunk_length=4000, lookahead_chunks=2, max_speed=MAX_GAME_SPEED):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.patterns = PATTERN_SETS[patterns] if isinstance(patterns, str) else patterns
+        self.difficulty = DIFFICULTY_CURVES[difficulty] if isinstance(difficulty, str) else difficulty
+        self.max_speed = max_speed
+        self.chunk_length = chunk_length
+        self.lookahead = chunk_length * lookahead_chunks
+        self.pending = deque()
+        self.generated_to = 0.0
+
+        # Position where the next pattern may start; the first obstacle
+        # arrives after the same delay the original game used
+        self.cursor = self.rng.uniform(1.5, 2.5) * INITIAL_GAME_SPEED * TICKS_PER_SECOND
+        while self.generated_to < self.lookahead:
+            self._generate_chunk()
+
+    def _pick_pattern(self):
+        roll = self.rng.random() * sum(weight for weight, _ in self.patterns)
+        for weight, pattern in self.patterns:
+            roll -= weight
+            if roll < 0:
+                return pattern
+        return self.patterns[-1][1]
+
+    def _generate_chunk(self):
+        """Append every spawn that starts before the end of the next chunk"""
+        chunk_end = self.generated_to + self.chunk_length
+        while self.cursor < chunk_end:
+            difficulty = self.difficulty(self.cursor, self.max_speed)
+            pieces, length = self._pick_pattern()(self.rng, difficulty)
+            for offset, shape_type, width, height in pieces:
+                self.pending.append(Spawn(self.cursor + offset, shape_type, width, height))
+            self.cursor += length + self.rng.uniform(difficulty['min_gap'], difficulty['max_gap'])
+        self.generated_to = chunk_end
+
+    def pop_due(self, distance):
+        """Return the next spawn whose position has been reached, or None"""
+        if self.generated_to - distance < self.lookahead:
+            self._generate_chunk()
+        if self.pending and self.pending[0].position <= distance:
+            return self.pending.popleft()
+        return None
+
+    def peek(self, count=1):
+        """Upcoming spawns without consuming them"""
+        return [self.pending[i] for i in range(min(count, len(self.pending)))]
+
+
+def analyse(stream, distance, band=20000):
+    """Print spawn statistics per distance band for offline tuning"""
+    print(f"seed={stream.seed} distance={distance}")
+    print(f"{'band':>13} {'count':>6} {'min gap':>8} {'mean gap':>9} {'max gap':>8} {'rects':>6}")
+    bands = {}
+    previous = None
+    while stream.peek()[0].position <= distance:
+        spawn = stream.pop_due(stream.peek()[0].position)
+        stats = bands.setdefault(int(spawn.position // band), {'count': 0, 'rects': 0, 'gaps': []})
+        if previous is not None:
+            stats['gaps'].append(spawn.position - previous)
+        previous = spawn.position
+        stats['rects'] += spawn.shape_type == "rect"
+        stats['count'] += 1
+
+    for index, stats in sorted(bands.items()):
+        gaps = stats['gaps'] or [0]
+        print(f"{index * band:>6}-{(index + 1) * band:<6} {stats['count']:>6} {min(gaps):>8.0f} "
+              f"{sum(gaps) / len(gaps):>9.0f} {max(gaps):>8.0f} {stats['rects'] / stats['count']:>6.0%}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect a generated level offline")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--distance", type=int, default=200000)
+    parser.add_argument("--patterns", choices=sorted(PATTERN_SETS), default='classic')
+    parser.add_argument("--difficulty", choices=sorted(DIFFICULTY_CURVES), default='classic')
+    args = parser.parse_args()
+    analyse(LevelStream(args.seed, args.patterns, args.difficulty), args.distance)
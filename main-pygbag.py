@@ -1,13 +1,41 @@
+from startup_trace import StartupTrace
+
 import pygame
 import random
 import sys
 import math
 import os
+import argparse
 import asyncio
+import atexit
+import time
+import json
+import warnings
+from collections import OrderedDict, deque
+
+from alloc_tracker import AllocationTracker
+from autopilot import Autopilot
+from beat_grid import BeatGrid
+from beat_map import find_beat_map
+from frame_profiler import FrameProfiler
+from framebuffer import SCALE_MODES, Presenter
+from frame_scheduler import FrameScheduler
+from glow import HaloCache, IndexedHalo, bake_halo, pulse_step
+from ghosts import EXTENSION as GHOST_EXTENSION, GhostRecorder, find_ghosts, load_ghosts, read_header
+from level_file import LevelFile
+from level_stream import (INITIAL_GAME_SPEED, MAX_GAME_SPEED, PATTERN_SETS, SPEED_STEP, SPEED_STEP_SECONDS,
+                          TICKS_PER_SECOND, LevelStream, level_key, scale_spawn_density)
+from obstacle_types import OBSTACLE_TYPES, polygon, random_size
+from palette import PaletteLayer, indexed_surface
+from particles import ParticleSystem
+from profile_capture import ProfileCapture
+from telemetry import TelemetryRecorder
+
+startup_trace = StartupTrace()
+startup_trace.mark("imports")
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+# Pygame subsystems (display, font, mixer) are initialized lazily where they
+# are first needed rather than all at once with pygame.init()
 
 # Game constants
 WIDTH, HEIGHT = 800, 400
@@ -15,12 +43,24 @@ GROUND_HEIGHT = HEIGHT - 50
 PLAYER_SIZE = 35  # Slightly larger player
 GRAVITY = 0.8     # Reduced gravity for higher jumps
 JUMP_FORCE = 18   # Increased jump force
-INITIAL_GAME_SPEED = 5  # Initial game speed
-MAX_GAME_SPEED = 12     # Maximum game speed
+# The speed constants (INITIAL_GAME_SPEED, MAX_GAME_SPEED, SPEED_STEP and
+# SPEED_STEP_SECONDS) come from level_stream.py, which lays levels out by them
 
 # Sound settings
 MUSIC_BPM = 120  # Beats per minute
-BEAT_INTERVAL = 60000 / MUSIC_BPM  # Milliseconds per beat
+BEAT_INTERVAL = 60000 / MUSIC_BPM  # Milliseconds per beat, unless the track has a beat map
+MUSIC_LOOP_FILE = "sounds/music_loop.ogg"  # Where the synthesized loop is written; the browser loads music by .ogg name
+MUSIC_SAMPLE_RATE = 44100
+MUSIC_SLICE_SAMPLES = 1024  # Music synthesized between checks of the frame budget
+MUSIC_FRAME_BUDGET = 0.004  # Seconds of each frame spent synthesizing the music while playing
+
+# Sound effect volumes, also used by build_web.py when pre-rendering
+SFX_VOLUMES = {'jump': 0.4, 'crash': 0.5, 'speed_up': 0.4}
+PRERENDERED_DIR = os.path.join("sounds", "prerendered")
+# Loaded before play starts; the rest streams in after the first frame
+CRITICAL_SOUNDS = ('jump', 'crash')
+# Where the web build serves the streamed sounds, relative to index.html
+DEFERRED_ASSET_URL = "assets"
 
 # Neon color themes
 NEON_COLORS = [
@@ -33,49 +73,259 @@ NEON_COLORS = [
     (255, 128, 0)     # Neon Orange
 ]
 
+# Particle colours are the neon palette followed by dust and spark colours
+PARTICLE_COLORS = NEON_COLORS + [(120, 120, 150), (255, 255, 255)]
+DUST_COLOR = len(NEON_COLORS)
+SPARK_COLOR = DUST_COLOR + 1
+
+# Ghost runs are saved here and drawn as translucent copies of the player
+GHOST_DIR = "ghosts"
+GHOST_COLOR = (200, 200, 255)
+GHOST_ALPHA = 90
+
+HIGHSCORE_PATH = "highscores.sqlite3"
+
 BG_COLOR = (20, 20, 30)  # Darker background to make neon colors pop
 PLAYER_COLOR = (0, 255, 255)  # Neon Cyan
 OBSTACLE_COLORS = [(255, 0, 128), (0, 255, 128), (255, 255, 0)]  # Neon colors
 GROUND_COLOR = (40, 40, 60)
 TEXT_COLOR = (255, 255, 255)
+GRID_SPACING = 40
+
+# Palette slots of the --palette layers and sprites
+BG_SLOT, GRID_SLOT = 0, 1
+GROUND_SLOT, GROUND_GRID_SLOT, GROUND_LINE_SLOT = 0, 1, 2
+BODY_SLOT = 1  # Slot 0 of a sprite is its colour key
+
+# The display is created by init_display() so importing this module stays cheap.
+# Everything draws into `screen`, a fixed WIDTH x HEIGHT framebuffer that is
+# scaled to the resizable window once per frame
+screen = None
+presenter = None  # Software scaler, only used when SDL can't scale on the GPU
+
+def init_display():
+    """Initialize the video subsystem, open the game window and create the framebuffer"""
+    global screen, presenter
+    pygame.display.init()
+    startup_trace.mark("display init")
+    # With SCALED the window surface stays WIDTH x HEIGHT and SDL's renderer
+    # stretches it to the window on flip, so the cost doesn't grow with the
+    # display. Nearest-neighbour filtering also makes SDL use whole factors
+    os.environ["SDL_RENDER_SCALE_QUALITY"] = "nearest" if options.scale == "integer" else "linear"
+    flags = pygame.SCALED | pygame.RESIZABLE | (pygame.FULLSCREEN if options.fullscreen else 0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # "no fast renderer available" is handled below
+        window = pygame.display.set_mode((WIDTH, HEIGHT), flags)
+    pygame.display.set_caption("Cube Runner '84")
+    if window.get_flags() & pygame.SCALED:
+        screen = window
+        presenter = None
+    else:
+        # No renderer to scale with (the browser, headless drivers): draw off
+        # screen and scale into the window in software
+        if options.fullscreen:
+            window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        screen = pygame.Surface((WIDTH, HEIGHT)).convert(window)
+        presenter = Presenter(screen, options.scale)
+    startup_trace.mark("window")
+    return screen
+
+def toggle_fullscreen():
+    if presenter is None:
+        pygame.display.toggle_fullscreen()
+    elif pygame.display.get_surface().get_flags() & pygame.FULLSCREEN:
+        pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    else:
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
 
-# Set up the display
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Cube Runner '84")
-clock = pygame.time.Clock()
+def present_frame():
+    """Scale the framebuffer into the window and show it"""
+    if presenter is not None:
+        presenter.present(pygame.display.get_surface())
+    pygame.display.flip()
 
-# Create sounds directory if it doesn't exist
-os.makedirs("sounds", exist_ok=True)
+# Fonts are loaded on first use and reused afterwards
+font_cache = {}
+
+def get_font(size):
+    font = font_cache.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = font_cache[size] = pygame.font.SysFont(None, size)
+        startup_trace.mark("fonts")
+    return font
 
 # Sound class to handle sound effects and music
 class SoundManager:
     def __init__(self):
         self.sounds = {}
+        self.music_file = None
+        self.manifest = {}
+        self.pending = []         # Sounds still to load after the critical set
+        self.deferred_total = 0
+        self.stream_task = None
+        self.paused_at = None     # get_ticks() when the music was paused
+        self.loaded = False
         self.music_playing = False
         self.last_beat_time = 0
         self.beat_count = 0
+        self.beat_clock = None    # Play time in ms of the spawn grid the music should follow
+        self.custom_music = None  # Track to play instead of the built-in loop
+        self.beat_timing_read = False
+        self.beat_interval = BEAT_INTERVAL
+        self.beat_offset = 0      # Ms from the start of the track to its first beat
+    
+    def load(self):
+        """Start the mixer and load the critical sounds; safe to call more than once"""
+        if self.loaded:
+            return
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
         
-        # Create simple sounds using Pygame
-        self._create_sounds()
-        
-    def _create_sounds(self):
-        # Create jump sound (simple beep with descending pitch)
-        jump_sound = self._create_beep(800, 400, 300)
-        jump_sound.set_volume(0.4)
-        self.sounds['jump'] = jump_sound
-        
-        # Create crash sound (noise)
-        crash_sound = self._create_noise(500)
-        crash_sound.set_volume(0.5)
-        self.sounds['crash'] = crash_sound
-        
-        # Create speed up sound (ascending beeps)
-        speed_sound = self._create_speed_up_sound()
-        speed_sound.set_volume(0.4)
-        self.sounds['speed_up'] = speed_sound
+        # The web build ships the sounds pre-rendered (see build_web.py);
+        # anything missing from the manifest is synthesized instead
+        self.manifest = self._load_manifest()
+        for name in CRITICAL_SOUNDS:
+            self._load_effect(name)
+        # Everything else is loaded by stream_deferred() once play has started
+        self.pending = [name for name in SFX_VOLUMES if name not in CRITICAL_SOUNDS]
+        self.pending.append('music_loop')
+        self.deferred_total = len(self.pending)
+        self.loaded = True
+    
+    def stream_deferred(self):
+        """Load the non-critical sounds in the background, one per frame"""
+        self.stream_task = asyncio.ensure_future(self._load_deferred())
+    
+    async def _load_deferred(self):
+        while self.pending:
+            name = self.pending[0]
+            await self._fetch_deferred(name)
+            if name == 'music_loop':
+                await self._load_music()
+            else:
+                self._load_effect(name)
+            self.pending.pop(0)
+            await asyncio.sleep(0)
+        if not self.music_playing:
+            phase = await self._wait_for_beat() if self.beat_clock else 0
+            self.start_music()
+            self.last_beat_time -= phase
+    
+    async def _wait_for_beat(self):
+        """Wait for the frame just after a beat of the spawn grid; returns how late it is in ms"""
+        interval, _ = self.beat_timing()
+        last = self.beat_clock() % interval
+        while True:
+            await asyncio.sleep(0)
+            phase = self.beat_clock() % interval
+            if phase < last:
+                return phase
+            last = phase
+    
+    def loading_progress(self):
+        """Fraction of the deferred sounds loaded so far"""
+        if not self.loaded:
+            return 0.0
+        return 1.0 - len(self.pending) / max(1, self.deferred_total)
+    
+    async def _fetch_deferred(self, name):
+        """Download a sound the web build keeps outside the bundle"""
+        entry = self.manifest.get(name)
+        if sys.platform != "emscripten" or entry is None or not entry.get('deferred'):
+            return
+        path = os.path.join(PRERENDERED_DIR, entry['file'])
+        if os.path.exists(path):
+            return
+        try:
+            import platform  # pygbag's platform module, fetches relative to the page
+            async with platform.fopen(f"{DEFERRED_ASSET_URL}/{entry['file']}", "rb") as source:
+                data = source.read()
+            with open(path, "wb") as f:
+                f.write(data)
+        except Exception:
+            print(f"Could not download {entry['file']}")
+    
+    def _load_effect(self, name):
+        sound = self._load_prerendered(self.manifest, name)
+        if sound is None:
+            sound = pygame.mixer.Sound(buffer=self.synthesize(name))
+        sound.set_volume(SFX_VOLUMES[name])
+        self.sounds[name] = sound
+    
+    def _music_path(self):
+        """The track to play: --music, else the pre-rendered loop, else the synthesized one"""
+        if self.custom_music:
+            return self.custom_music
+        music = (self.manifest or self._load_manifest()).get('music_loop')
+        return os.path.join(PRERENDERED_DIR, music['file']) if music else MUSIC_LOOP_FILE
+    
+    async def _load_music(self):
+        path = self._music_path()
+        if path != MUSIC_LOOP_FILE and os.path.exists(path):
+            self.music_file = path
+            return
+        # Synthesize the loop a few slices per frame; all at once it stalls play
+        # for a third of a second, and the browser has no threads to hand it to
+        buf = self._music_buffer()
+        frame_start = time.perf_counter()
+        for _ in self._write_music(buf):
+            if time.perf_counter() - frame_start > MUSIC_FRAME_BUDGET:
+                await asyncio.sleep(0)
+                frame_start = time.perf_counter()
+        self.music_file = self._save_music_loop(buf)
+    
+    def beat_timing(self):
+        """(ms per beat, ms to the first beat) of the music
         
-        # Create simple music loop
-        self._create_music_loop()
+        Read from the track's beat map, written by music_analysis.py, when it
+        has one; otherwise the synthesized loop's MUSIC_BPM from its first sample.
+        """
+        if not self.beat_timing_read:
+            self.beat_timing_read = True
+            beat_map = find_beat_map(self._music_path())
+            if beat_map is not None:
+                interval = beat_map.beat_ms
+                # The track loops; when it holds a whole number of beats give or
+                # take a little analysis error, fit them exactly so they don't drift
+                beats = round(beat_map.duration_ms / interval)
+                if beats and abs(beat_map.duration_ms / interval - beats) < 0.1:
+                    interval = beat_map.duration_ms / beats
+                self.beat_interval = interval
+                self.beat_offset = beat_map.offset_ms % interval
+        return self.beat_interval, self.beat_offset
+    
+    def _load_manifest(self):
+        """Assets listed in the pre-rendered manifest, or {} when there is none"""
+        try:
+            with open(os.path.join(PRERENDERED_DIR, "manifest.json")) as f:
+                return json.load(f).get('assets', {})
+        except (OSError, ValueError):
+            return {}
+    
+    def _load_prerendered(self, manifest, name):
+        entry = manifest.get(name)
+        if entry is None:
+            return None
+        try:
+            return pygame.mixer.Sound(os.path.join(PRERENDERED_DIR, entry['file']))
+        except (pygame.error, OSError, KeyError):
+            print(f"Could not load pre-rendered {name}, synthesizing it")
+            return None
+    
+    def synthesize(self, name):
+        """Raw 16-bit sample buffer for one sound effect"""
+        if name == 'jump':
+            # Simple beep with descending pitch
+            return self._create_beep(800, 400, 300)
+        if name == 'crash':
+            # Noise
+            return self._create_noise(500)
+        if name == 'speed_up':
+            # Ascending beeps
+            return self._create_speed_up_sound()
+        raise KeyError(name)
     
     def _create_beep(self, start_freq, end_freq, duration_ms):
         """Create a simple beep sound with frequency sweep"""
@@ -97,7 +347,7 @@ class SoundManager:
             buf[i*2] = value & 0xFF
             buf[i*2 + 1] = (value >> 8) & 0xFF
         
-        return pygame.mixer.Sound(buffer=buf)
+        return buf
     
     def _create_noise(self, duration_ms):
         """Create a noise sound for crash effect"""
@@ -117,7 +367,7 @@ class SoundManager:
             buf[i*2] = value & 0xFF
             buf[i*2 + 1] = (value >> 8) & 0xFF
         
-        return pygame.mixer.Sound(buffer=buf)
+        return buf
     
     def _create_speed_up_sound(self):
         """Create a speed up notification sound"""
@@ -143,20 +393,34 @@ class SoundManager:
                 buf[i*2] = value & 0xFF
                 buf[i*2 + 1] = (value >> 8) & 0xFF
         
-        return pygame.mixer.Sound(buffer=buf)
+        return buf
     
-    def _create_music_loop(self):
-        """Create a simple 8-bit style music loop"""
+    def _save_music_loop(self, buf):
+        """Write the synthesized music loop to disk and return its filename"""
+        try:
+            return self._save_wav_to_file(buf, MUSIC_SAMPLE_RATE)
+        except OSError:
+            print("Could not create music loop")
+            return None
+    
+    def music_samples(self):
+        """Create a simple 8-bit style music loop as mono 16-bit samples"""
+        buf = self._music_buffer()
+        for _ in self._write_music(buf):
+            pass
+        return buf
+    
+    def _music_buffer(self):
+        """A silent buffer the length of the music loop, 16 beats"""
+        samples = int(16 * 60 / MUSIC_BPM * MUSIC_SAMPLE_RATE)
+        return bytearray(samples * 2)  # 16-bit samples
+    
+    def _write_music(self, buf):
+        """Write the music loop into `buf`, yielding after every MUSIC_SLICE_SAMPLES or fewer"""
         # Create a simple music pattern
-        sample_rate = 44100
-        bpm = MUSIC_BPM
+        sample_rate = MUSIC_SAMPLE_RATE
         beats = 16
-        
-        duration = beats * 60 / bpm
-        samples = int(duration * sample_rate)
-        
-        # Create buffer
-        buf = bytearray(samples * 2)  # 16-bit samples
+        samples = len(buf) // 2
         
         # Define a simple melody (C major scale notes)
         notes = [261.63, 293.66, 329.63, 349.23, 392.00, 440.00, 493.88, 523.25]
@@ -171,40 +435,39 @@ class SoundManager:
             
             note = notes[pattern[beat]]
             
-            for i in range(start_sample, end_sample):
-                t = (i - start_sample) / sample_rate
-                
-                # Create a simple square wave
-                value = 32767 * 0.2 * (1 if math.sin(2 * math.pi * note * t) > 0 else -1)
-                
-                # Apply simple envelope
-                env = 1.0
-                if i - start_sample < (end_sample - start_sample) * 0.1:
-                    env = (i - start_sample) / ((end_sample - start_sample) * 0.1)
-                elif i - start_sample > (end_sample - start_sample) * 0.7:
-                    env = 1.0 - (i - start_sample - (end_sample - start_sample) * 0.7) / ((end_sample - start_sample) * 0.3)
-                
-                value = int(value * env)
-                
-                # Add to buffer
-                existing_value = (buf[i*2 + 1] << 8) | buf[i*2]
-                if existing_value > 32767:
-                    existing_value -= 65536
-                
-                new_value = max(min(existing_value + value, 32767), -32768)
-                
-                buf[i*2] = new_value & 0xFF
-                buf[i*2 + 1] = (new_value >> 8) & 0xFF
-        
-        # Create a Sound object directly from the buffer
-        try:
-            pygame.mixer.music.load(self._save_wav_to_file(buf, sample_rate))
-        except:
-            print("Could not create music loop")
+            for slice_start in range(start_sample, end_sample, MUSIC_SLICE_SAMPLES):
+                for i in range(slice_start, min(slice_start + MUSIC_SLICE_SAMPLES, end_sample)):
+                    t = (i - start_sample) / sample_rate
+                    
+                    # Create a simple square wave
+                    value = 32767 * 0.2 * (1 if math.sin(2 * math.pi * note * t) > 0 else -1)
+                    
+                    # Apply simple envelope
+                    env = 1.0
+                    if i - start_sample < (end_sample - start_sample) * 0.1:
+                        env = (i - start_sample) / ((end_sample - start_sample) * 0.1)
+                    elif i - start_sample > (end_sample - start_sample) * 0.7:
+                        env = 1.0 - (i - start_sample - (end_sample - start_sample) * 0.7) / ((end_sample - start_sample) * 0.3)
+                    
+                    value = int(value * env)
+                    
+                    # Add to buffer
+                    existing_value = (buf[i*2 + 1] << 8) | buf[i*2]
+                    if existing_value > 32767:
+                        existing_value -= 65536
+                    
+                    new_value = max(min(existing_value + value, 32767), -32768)
+                    
+                    buf[i*2] = new_value & 0xFF
+                    buf[i*2 + 1] = (new_value >> 8) & 0xFF
+                yield
     
     def _save_wav_to_file(self, buf, sample_rate):
         """Save buffer as a WAV file and return the filename"""
-        filename = "sounds/music_loop.ogg"
+        filename = MUSIC_LOOP_FILE
+        
+        # Create sounds directory if it doesn't exist
+        os.makedirs("sounds", exist_ok=True)
         
         # Save the music file
         with open(filename, "wb") as f:
@@ -234,12 +497,19 @@ class SoundManager:
     def start_music(self):
         """Start playing the music loop"""
         try:
-            pygame.mixer.music.load("sounds/music_loop.ogg")
+            pygame.mixer.music.load(self.music_file)
             pygame.mixer.music.set_volume(0.5)
             pygame.mixer.music.play(-1)  # Loop indefinitely
             self.music_playing = True
-            self.last_beat_time = pygame.time.get_ticks()
+            now = pygame.time.get_ticks()
+            interval, offset = self.beat_timing()
+            # As if the beat before the track's first one had just gone by
+            self.last_beat_time = now + offset - interval
             self.beat_count = 0
+            if self.paused_at is not None:
+                # Started while paused, so hold it until set_paused(False)
+                pygame.mixer.music.pause()
+                self.paused_at = now
         except:
             print("Could not load music file")
             self.music_playing = False
@@ -250,24 +520,44 @@ class SoundManager:
             pygame.mixer.music.stop()
             self.music_playing = False
     
+    def set_paused(self, paused):
+        """Pause or resume the music, keeping the beat phase across the pause"""
+        if paused and self.paused_at is None:
+            self.paused_at = pygame.time.get_ticks()
+            if self.music_playing:
+                pygame.mixer.music.pause()
+        elif not paused and self.paused_at is not None:
+            self.last_beat_time += pygame.time.get_ticks() - self.paused_at
+            self.paused_at = None
+            if self.music_playing:
+                pygame.mixer.music.unpause()
+    
     def update(self):
         """Update beat tracking"""
-        if not self.music_playing:
+        if not self.music_playing or self.paused_at is not None:
             return False, self.beat_count
         
         current_time = pygame.time.get_ticks()
         beat_occurred = False
         
         # Check if a beat has occurred
-        if current_time - self.last_beat_time > BEAT_INTERVAL:
-            self.last_beat_time = current_time - ((current_time - self.last_beat_time) % BEAT_INTERVAL)
+        if current_time - self.last_beat_time > self.beat_interval:
+            self.last_beat_time = current_time - ((current_time - self.last_beat_time) % self.beat_interval)
             self.beat_count += 1
             beat_occurred = True
         
         return beat_occurred, self.beat_count
 
+def draw_background_grid(surface, bg_color, grid_color):
+    """Fill the sky and draw its faint grid; colours are slots when `surface` is indexed"""
+    surface.fill(bg_color, (0, 0, WIDTH, GROUND_HEIGHT))
+    for x in range(0, WIDTH, GRID_SPACING):
+        pygame.draw.line(surface, grid_color, (x, 0), (x, GROUND_HEIGHT), 1)
+    for y in range(0, GROUND_HEIGHT, GRID_SPACING):
+        pygame.draw.line(surface, grid_color, (0, y), (WIDTH, y), 1)
+
 class BackgroundEffect:
-    def __init__(self, game_speed):
+    def __init__(self, game_speed, line_count=15, shape_count=10):
         self.lines = []
         self.shapes = []
         self.bg_color = BG_COLOR
@@ -276,9 +566,13 @@ class BackgroundEffect:
         self.color_change_interval = 10000  # 10 seconds
         self.color_transition_speed = 0.05
         self.game_speed = game_speed
+        self.layer = None
+        if options.palette:
+            self.layer = PaletteLayer(indexed_surface((WIDTH, GROUND_HEIGHT), (BG_COLOR, BG_COLOR)))
+            draw_background_grid(self.layer.surface, BG_SLOT, GRID_SLOT)
         
         # Initialize background lines
-        for _ in range(15):
+        for _ in range(line_count):
             self.lines.append({
                 'x': random.randint(0, WIDTH),
                 'y': random.randint(0, GROUND_HEIGHT - 20),
@@ -289,7 +583,7 @@ class BackgroundEffect:
             })
         
         # Initialize background shapes
-        for _ in range(10):
+        for _ in range(shape_count):
             shape_type = random.choice(['circle', 'rect', 'triangle'])
             self.shapes.append({
                 'x': random.randint(0, WIDTH),
@@ -341,16 +635,14 @@ class BackgroundEffect:
                 shape['alpha'] = random.randint(30, 100)
     
     def draw(self):
-        # Fill background with current color
-        screen.fill(self.bg_color)
-        
-        # Draw grid lines (faint)
         grid_color = (self.bg_color[0] + 20, self.bg_color[1] + 20, self.bg_color[2] + 20)
-        grid_spacing = 40
-        for x in range(0, WIDTH, grid_spacing):
-            pygame.draw.line(screen, grid_color, (x, 0), (x, GROUND_HEIGHT), 1)
-        for y in range(0, GROUND_HEIGHT, grid_spacing):
-            pygame.draw.line(screen, grid_color, (0, y), (WIDTH, y), 1)
+        if self.layer is not None:
+            # The grid was drawn once; fading the colours only rewrites two palette entries
+            self.layer.set_color(BG_SLOT, self.bg_color)
+            self.layer.set_color(GRID_SLOT, grid_color)
+            self.layer.draw(screen)
+        else:
+            draw_background_grid(screen, self.bg_color, grid_color)
         
         # Draw shapes (behind lines)
         for shape in self.shapes:
@@ -393,25 +685,30 @@ class BackgroundEffect:
                 line['thickness']
             )
 class Player:
-    def __init__(self):
+    def __init__(self, trail_max=10):
         self.size = PLAYER_SIZE
         self.x = 100
         self.y = GROUND_HEIGHT - self.size
+        self.prev_y = self.y
         self.vel_y = 0
         self.jumping = False
         self.rotation = 0
         self.trail = []
-        self.trail_max = 10
+        self.trail_max = trail_max
         self.color = PLAYER_COLOR
         self.pulse_effect = 0
     
-    def jump(self, sound_manager):
+    def jump(self, sound_manager=None):
         if not self.jumping:
             self.vel_y = -JUMP_FORCE
             self.jumping = True
-            sound_manager.play_sound('jump')
+            if sound_manager:
+                sound_manager.play_sound('jump')
     
     def update(self):
+        # Remember where this update started for swept collision
+        self.prev_y = self.y
+        
         # Apply gravity
         self.vel_y += GRAVITY
         self.y += self.vel_y
@@ -437,6 +734,9 @@ class Player:
         self.pulse_effect = (self.pulse_effect + 0.1) % (2 * math.pi)
     
     def draw(self):
+        if options.palette:
+            self.draw_indexed()
+            return
         # Draw trail
         for i, pos in enumerate(self.trail):
             alpha = int(255 * (i / self.trail_max))
@@ -446,216 +746,615 @@ class Player:
             trail_rect = trail_surface.get_rect(center=pos)
             screen.blit(trail_surface, trail_rect)
         
-        # Create a surface for the square
-        square_surface = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
-        
-        # Add glow effect
-        glow_size = int(self.size + 4 + 2 * math.sin(self.pulse_effect))
-        glow_surface = pygame.Surface((glow_size, glow_size), pygame.SRCALPHA)
-        pygame.draw.rect(glow_surface, (*self.color, 100), (0, 0, glow_size, glow_size))
-        glow_rect = glow_surface.get_rect(center=(self.size//2, self.size//2))
-        square_surface.blit(glow_surface, glow_rect)
-        
-        # Draw the main square
-        pygame.draw.rect(square_surface, self.color, (0, 0, self.size, self.size))
-        
-        # Rotate the surface
-        rotated_surface = pygame.transform.rotate(square_surface, self.rotation)
-        rotated_rect = rotated_surface.get_rect(center=(self.x + self.size//2, self.y + self.size//2))
+        self.draw_halo()
         
         # Draw the rotated square
+        rotated_surface = get_player_sprite(self.color, self.rotation)
+        rotated_rect = rotated_surface.get_rect(center=(self.x + self.size//2, self.y + self.size//2))
         screen.blit(rotated_surface, rotated_rect)
+    
+    def draw_indexed(self):
+        """Draw from shared 8-bit stencils, so a colour change is a palette write per sprite"""
+        for i, pos in enumerate(self.trail):
+            square = get_trail_square(int(self.size * (i / self.trail_max) * 0.8),
+                                      int(255 * (i / self.trail_max)))
+            square.set_color(BODY_SLOT, self.color)
+            square.draw(screen, square.surface.get_rect(center=pos))
+        
+        halo = get_player_indexed_halo(self.rotation).step(pulse_step(self.pulse_effect), self.color)
+        screen.blit(halo, halo.get_rect(center=(self.x + self.size//2, self.y + self.size//2)),
+                    special_flags=pygame.BLEND_ADD)
+        stencil = get_player_stencil(self.rotation)
+        stencil.set_color(BODY_SLOT, self.color)
+        stencil.draw(screen, stencil.surface.get_rect(center=(self.x + self.size//2, self.y + self.size//2)))
+    
+    def draw_halo(self):
+        halo = get_player_halo(self.color, self.rotation)[pulse_step(self.pulse_effect)]
+        screen.blit(halo, halo.get_rect(center=(self.x + self.size//2, self.y + self.size//2)),
+                    special_flags=pygame.BLEND_ADD)
+
+player_sprites = {}
+
+def get_player_sprite(color, rotation, alpha=255):
+    """The player's square in `color`, rotated and faded, built once per combination"""
+    key = (color, rotation % 360, alpha)
+    sprite = player_sprites.get(key)
+    if sprite is None:
+        # The glow the square used to be drawn over was covered completely by
+        # the square itself, so the sprite is just the filled square
+        square_surface = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
+        pygame.draw.rect(square_surface, color, (0, 0, PLAYER_SIZE, PLAYER_SIZE))
+        sprite = pygame.transform.rotate(square_surface, rotation % 360)
+        if alpha < 255:
+            sprite.set_alpha(alpha)
+        player_sprites[key] = sprite
+    return sprite
+
+# Halos of the player and of glowing text, baked by bake_halos() or on first use
+halo_cache = HaloCache(capacity=64)
+PLAYER_GLOW_RADIUS = 12
+PLAYER_GLOW_STEP = 15  # Degrees between baked halo rotations; a square repeats every 90
+TEXT_GLOW_RADIUS = 12
+
+def get_player_halo(color, rotation):
+    """The halo ladder of the player's square at the nearest baked rotation"""
+    angle = round(rotation / PLAYER_GLOW_STEP) * PLAYER_GLOW_STEP % 90
+    return halo_cache.get(('player', color, angle), get_player_sprite(color, angle), color,
+                          PLAYER_GLOW_RADIUS, low=0.6)
+
+def get_text_halo(text, font_size, color, text_surface=None):
+    """The halo ladder of a line of glowing text"""
+    if text_surface is None:
+        text_surface = get_font(font_size).render(text, True, color)
+    return halo_cache.get(('text', text, font_size, color), text_surface, color, TEXT_GLOW_RADIUS,
+                          strength=1.5, low=0.5)
+
+def draw_glowing_text(text, font_size, color, center):
+    """Render `text` centred on `center` over a pulsing halo"""
+    text_surface = get_font(font_size).render(text, True, color)
+    halo = get_text_halo(text, font_size, color, text_surface)[pulse_step(pygame.time.get_ticks() / 300)]
+    screen.blit(halo, halo.get_rect(center=center), special_flags=pygame.BLEND_ADD)
+    screen.blit(text_surface, text_surface.get_rect(center=center))
+
+def bake_halos():
+    """Bake the player's halo in every colour and rotation step, and the glowing messages'"""
+    for angle in range(0, 90, PLAYER_GLOW_STEP):
+        if options.palette:  # One halo per rotation, recoloured through its palette
+            get_player_indexed_halo(angle)
+            continue
+        for color in dict.fromkeys(NEON_COLORS + [PLAYER_COLOR]):
+            get_player_halo(color, angle)
+    # In neon pink, as show_game_over() and show_speed_up_notification() draw them
+    for text, font_size in (("Game Over", 72), ("Speed Up!", 36)):
+        get_text_halo(text, font_size, NEON_COLORS[0])
+
+# 8-bit versions for --palette, drawn in BODY_SLOT and recoloured on every blit
+player_stencils = {}
+trail_squares = {}
+player_indexed_halos = {}
+
+def get_player_indexed_halo(rotation):
+    """The player's halo at the nearest baked rotation, in whatever colour it is drawn in"""
+    angle = round(rotation / PLAYER_GLOW_STEP) * PLAYER_GLOW_STEP % 90
+    halo = player_indexed_halos.get(angle)
+    if halo is None:
+        halo = player_indexed_halos[angle] = IndexedHalo(get_player_sprite(PLAYER_COLOR, angle),
+                                                         PLAYER_GLOW_RADIUS, low=0.6)
+    return halo
+
+def get_player_stencil(rotation):
+    """The player's square rotated, in whatever colour its palette is given"""
+    rotation %= 360
+    stencil = player_stencils.get(rotation)
+    if stencil is None:
+        square = PaletteLayer(indexed_surface((PLAYER_SIZE, PLAYER_SIZE), (BG_COLOR, PLAYER_COLOR),
+                                              colorkey=True))
+        square.surface.fill(BODY_SLOT)
+        stencil = player_stencils[rotation] = square.rotated(rotation)
+    return stencil
+
+def get_trail_square(size, alpha):
+    """A faded trail square, in whatever colour its palette is given"""
+    key = (size, alpha)
+    square = trail_squares.get(key)
+    if square is None:
+        square = PaletteLayer(indexed_surface((size, size), (BG_COLOR, PLAYER_COLOR)))
+        square.surface.fill(BODY_SLOT)
+        square.surface.set_alpha(alpha)
+        trail_squares[key] = square
+    return square
+
+def draw_ghosts(ghosts, x):
+    for ghost in ghosts:
+        if ghost.finished or ghost.y is None:
+            continue
+        sprite = get_player_sprite(GHOST_COLOR, ghost.air_ticks * 5, GHOST_ALPHA)
+        screen.blit(sprite, sprite.get_rect(center=(x + PLAYER_SIZE // 2, ghost.y + PLAYER_SIZE // 2)))
+
+def save_ghost(recorder, score):
+    """Save the run as the last ghost, and as the personal best if it beat it"""
+    best_path = os.path.join(GHOST_DIR, "best" + GHOST_EXTENSION)
+    try:
+        recorder.save(os.path.join(GHOST_DIR, "last" + GHOST_EXTENSION), score)
+        try:
+            best_score = read_header(best_path)[2]
+        except (OSError, ValueError):
+            best_score = -1
+        if score > best_score:
+            recorder.save(best_path, score)
+    except OSError as e:
+        print(f"Could not save ghost: {e}")
+
+# Baked sprites and halo ladders per (type, width, height, colour), with the
+# least recently used dropped. Sizes are drawn from ranges, so the cache is
+# bounded rather than exhaustive; the game bakes each size before it reaches
+# the screen with bake_obstacle_sprites().
+SPRITE_CACHE_SIZE = 128
+sprite_cache = OrderedDict()
+OBSTACLE_BAKE_AHEAD = 8  # Upcoming spawns whose sprites are baked ahead of time
+
+def get_obstacle_sprites(kind, width, height, color):
+    """The obstacle's body sprite and the halo ladder that glows around it"""
+    key = (kind.name, width, height, color)
+    sprites = sprite_cache.get(key)
+    if sprites is not None:
+        sprite_cache.move_to_end(key)
+        return sprites
+    body_color = (min(color[0] + 50, 255), min(color[1] + 50, 255), min(color[2] + 50, 255))
+    # Black is never an obstacle colour, so it can serve as the colour key
+    body = pygame.Surface((width, height))
+    body.fill((0, 0, 0))
+    pygame.draw.polygon(body, body_color, polygon(kind, width, height))
+    body.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+    radius, low = kind.glow
+    sprites = sprite_cache[key] = (body, bake_halo(body, color, radius, low=low))
+    if len(sprite_cache) > SPRITE_CACHE_SIZE:
+        sprite_cache.popitem(last=False)
+    return sprites
+
+def bake_obstacle_sprites(spawns, limit=None):
+    """Bake the sprites, halos and collision masks of upcoming spawns in every obstacle colour
+
+    Sizes already baked are skipped. With `limit`, at most that many new
+    sizes are baked, so the game loop can spread them over frames. Returns
+    how many were baked.
+    """
+    baked = 0
+    for spawn in spawns:
+        kind = OBSTACLE_TYPES[spawn.shape_type]
+        width, height = spawn.width, spawn.height
+        if width and not height and kind.height is None:
+            height = width
+        if not (width and height):
+            continue  # A size picked at spawn time can't be baked ahead
+        if all((kind.name, width, height, color) in sprite_cache for color in OBSTACLE_COLORS):
+            continue
+        if limit is not None and baked >= limit:
+            break
+        get_collision_mask(kind, width, height)
+        for color in OBSTACLE_COLORS:
+            get_obstacle_sprites(kind, width, height, color)
+        baked += 1
+    return baked
 
 class Obstacle:
-    def __init__(self, x, shape_type, game_speed):
+    """A pooled obstacle of any type in OBSTACLE_TYPES
+
+    Everything that depends on the type (sprite, halo, collision mask,
+    offsets) is looked up once in reset(), so update(), draw() and the
+    collision tests run the same code for every type.
+    """
+    # Fixed attribute layout so pooled records carry no per-instance dict
+    __slots__ = ('x', 'prev_x', 'y', 'base_y', 'width', 'height', 'kind', 'color',
+                 'pulse_effect', 'phase', 'game_speed', 'body', 'halos', 'margin', 'mask', 'solid')
+    
+    def __init__(self, x=0, shape_type="rect", game_speed=INITIAL_GAME_SPEED, width=None, height=None):
+        self.reset(x, shape_type, game_speed, width, height)
+    
+    def reset(self, x, shape_type, game_speed, width=None, height=None):
+        """Re-initialise this record in place for a new spawn"""
+        kind = OBSTACLE_TYPES[shape_type]
+        if not width:
+            width, height = random_size(kind, random)
+        elif not height:
+            height = width if kind.height is None else random.randint(*kind.height)
         self.x = x
-        self.shape_type = shape_type  # "rect" or "triangle"
+        self.prev_x = x
+        self.kind = kind
+        self.width = width
+        self.height = height
+        self.base_y = self.y = GROUND_HEIGHT - height - kind.lift
+        self.phase = 0.0
         self.color = random.choice(OBSTACLE_COLORS)
         self.pulse_effect = random.random() * 2 * math.pi
         self.game_speed = game_speed
-        
-        if shape_type == "rect":
-            self.width = random.randint(20, 40)
-            self.height = random.randint(20, 60)
-            self.y = GROUND_HEIGHT - self.height
-        else:  # triangle
-            self.size = random.randint(20, 40)
-            self.y = GROUND_HEIGHT - self.size
+        self.body, self.halos = get_obstacle_sprites(kind, width, height, self.color)
+        self.margin = kind.glow[0]
+        self.mask = get_collision_mask(kind, width, height)
+        self.solid = self.mask.count() == width * height
+        return self
     
     def update(self, game_speed):
         self.game_speed = game_speed
+        self.prev_x = self.x
         self.x -= self.game_speed
         self.pulse_effect = (self.pulse_effect + 0.05) % (2 * math.pi)
+        # Bob up from the resting height; still types have no amplitude
+        amplitude, rate = self.kind.motion
+        self.phase = (self.phase + rate) % (2 * math.pi)
+        self.y = self.base_y - amplitude * 0.5 * (1 - math.cos(self.phase))
     
     def draw(self):
-        # Calculate glow size based on pulse effect
-        glow_size = int(3 + 2 * math.sin(self.pulse_effect))
-        
-        if self.shape_type == "rect":
-            # Draw glow
-            pygame.draw.rect(
-                screen, 
-                self.color, 
-                (self.x - glow_size, self.y - glow_size, 
-                 self.width + glow_size*2, self.height + glow_size*2),
-                0
-            )
-            
-            # Draw main shape
-            pygame.draw.rect(
-                screen, 
-                (min(self.color[0] + 50, 255), 
-                 min(self.color[1] + 50, 255), 
-                 min(self.color[2] + 50, 255)), 
-                (self.x, self.y, self.width, self.height)
-            )
-        else:  # triangle
-            # Points for the triangle
-            points = [
-                (self.x, self.y + self.size),
-                (self.x + self.size, self.y + self.size),
-                (self.x + self.size // 2, self.y)
-            ]
-            
-            # Draw glow
-            glow_points = [
-                (points[0][0] - glow_size, points[0][1] + glow_size),
-                (points[1][0] + glow_size, points[1][1] + glow_size),
-                (points[2][0], points[2][1] - glow_size)
-            ]
-            pygame.draw.polygon(screen, self.color, glow_points)
-            
-            # Draw main shape
-            pygame.draw.polygon(
-                screen, 
-                (min(self.color[0] + 50, 255), 
-                 min(self.color[1] + 50, 255), 
-                 min(self.color[2] + 50, 255)), 
-                points
-            )
+        # The pulse picks a rung of the halo's brightness ladder, added onto the background
+        screen.blit(self.halos[pulse_step(self.pulse_effect)], (self.x - self.margin, self.y - self.margin),
+                    special_flags=pygame.BLEND_ADD)
+        screen.blit(self.body, (self.x, self.y))
     
     def is_off_screen(self):
-        return self.x < -50
+        return self.x + self.width + self.margin < 0
 
-def check_collision(player, obstacle):
+class ObstaclePool:
+    """Fixed-capacity pool of obstacle records with O(1) spawn and retire"""
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        # Placeholders are all the same size so they share one baked sprite
+        self.free = [Obstacle(width=20, height=20) for _ in range(capacity)]
+        # Obstacles all scroll left at the same speed, so the oldest one is
+        # always the leftmost and retiring only ever happens at the front
+        self.active = deque()
+    
+    def __len__(self):
+        return len(self.active)
+    
+    def __iter__(self):
+        return iter(self.active)
+    
+    def last(self):
+        """Return the most recently spawned obstacle, or None"""
+        return self.active[-1] if self.active else None
+    
+    def spawn(self, x, shape_type, game_speed, width=None, height=None):
+        """Take a record from the free list, or return None if the pool is full"""
+        if not self.free:
+            return None
+        obstacle = self.free.pop().reset(x, shape_type, game_speed, width, height)
+        self.active.append(obstacle)
+        return obstacle
+    
+    def update(self, game_speed):
+        """Move every obstacle and retire the ones that left the screen"""
+        for obstacle in self.active:
+            obstacle.update(game_speed)
+        
+        retired = 0
+        while self.active and self.active[0].is_off_screen():
+            self.free.append(self.active.popleft())
+            retired += 1
+        return retired
+    
+    def clear(self):
+        while self.active:
+            self.free.append(self.active.popleft())
+    
+    def bytes_per_obstacle(self):
+        """Approximate memory held by one pooled record (object plus slot values)"""
+        obstacle = self.active[0] if self.active else self.free[0]
+        total = sys.getsizeof(obstacle)
+        for name in Obstacle.__slots__:
+            value = getattr(obstacle, name)
+            # Small ints and interned strings are shared, only count the tuple
+            if isinstance(value, (float, tuple)):
+                total += sys.getsizeof(value)
+        return total
+    
+    def memory_report(self):
+        per_obstacle = self.bytes_per_obstacle()
+        return (f"Obstacle pool: {len(self.active)}/{self.capacity} active, "
+                f"{per_obstacle} bytes per obstacle, "
+                f"{per_obstacle * self.capacity} bytes total")
+
+# The player collides as a plain box
+PLAYER_SHAPE = OBSTACLE_TYPES['rect']
+
+def player_hitbox(player):
     # Add a small forgiveness margin to make the game slightly easier
-    player_rect = pygame.Rect(player.x + 2, player.y + 2, player.size - 4, player.size - 4)
+    return pygame.Rect(player.x + 2, player.y + 2, player.size - 4, player.size - 4)
+
+def obstacle_hitbox(obstacle):
+    """Bounding box of the obstacle, used as the cheap first collision test"""
+    return pygame.Rect(obstacle.x, obstacle.y, obstacle.width, obstacle.height)
+
+# Collision masks are built once per (type, width, height) and shared
+mask_cache = {}
+
+def get_collision_mask(kind, width, height):
+    key = (kind.name, width, height)
+    mask = mask_cache.get(key)
+    if mask is None:
+        # Rasterised the same way as the sprite body, less the type's inset
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        pygame.draw.polygon(surface, (255, 255, 255), polygon(kind, width, height, inset=kind.inset))
+        mask = pygame.mask.from_surface(surface)
+        mask_cache[key] = mask
+    return mask
+
+def check_collision(player, obstacle):
+    player_rect = player_hitbox(player)
+    obstacle_rect = obstacle_hitbox(obstacle)
     
-    if obstacle.shape_type == "rect":
-        obstacle_rect = pygame.Rect(obstacle.x, obstacle.y, obstacle.width, obstacle.height)
-    else:  # For triangle, use a more forgiving hitbox
-        obstacle_rect = pygame.Rect(obstacle.x + obstacle.size//4, obstacle.y + obstacle.size//4, 
-                                   obstacle.size//2, obstacle.size//2)
+    # Reject on bounding boxes first; only near hits on shaped obstacles pay for the mask test
+    if not player_rect.colliderect(obstacle_rect):
+        return False
+    if obstacle.solid:
+        return True
     
-    return player_rect.colliderect(obstacle_rect)
+    player_mask = get_collision_mask(PLAYER_SHAPE, player_rect.width, player_rect.height)
+    offset = (obstacle_rect.x - player_rect.x, obstacle_rect.y - player_rect.y)
+    return player_mask.overlap(obstacle.mask, offset) is not None
 
-def draw_ground():
-    # Draw ground with grid pattern
-    pygame.draw.rect(screen, GROUND_COLOR, (0, GROUND_HEIGHT, WIDTH, HEIGHT - GROUND_HEIGHT))
+def swept_collision(player, obstacle):
+    """Time of impact in [0, 1] over the last update, or None if they never touched
+    
+    Both hitboxes are swept from their previous to their current positions,
+    so a fast obstacle or a long frame can't tunnel through the player.
+    """
+    px, py = player.x + 2, player.prev_y + 2
+    player_size = player.size - 4
+    ox, oy = obstacle.prev_x, obstacle.y
+    ow, oh = obstacle.width, obstacle.height
+    obstacle_dx = obstacle.x - obstacle.prev_x
+    player_dy = player.y - player.prev_y
+    
+    # Solve in the obstacle's frame of reference, where only the player moves
+    entry, exit = -math.inf, math.inf
+    for p_min, o_min, o_len, d in ((px, ox, ow, -obstacle_dx), (py, oy, oh, player_dy)):
+        if d == 0:
+            if p_min + player_size <= o_min or p_min >= o_min + o_len:
+                return None
+            continue
+        t0 = (o_min - (p_min + player_size)) / d
+        t1 = (o_min + o_len - p_min) / d
+        if t0 > t1:
+            t0, t1 = t1, t0
+        entry = max(entry, t0)
+        exit = min(exit, t1)
+    if entry >= exit or entry >= 1 or exit <= 0:
+        return None
+    
+    toi = max(entry, 0.0)
+    if obstacle.solid:
+        return toi
+    
+    # Walk the overlapping part of the sweep with the exact mask, a couple of
+    # pixels of relative motion per step
+    end = min(exit, 1.0)
+    steps = max(1, math.ceil((end - toi) * max(abs(obstacle_dx), abs(player_dy)) / 2))
+    player_mask = get_collision_mask(PLAYER_SHAPE, player_size, player_size)
+    for i in range(steps + 1):
+        t = toi + (end - toi) * i / steps
+        offset = (int(ox + obstacle_dx * t) - int(px), int(oy) - int(py + player_dy * t))
+        if player_mask.overlap(obstacle.mask, offset) is not None:
+            return t
+    return None
+
+def create_autopilot():
+    """Build an autopilot that plans against the same physics and hitboxes as the game"""
+    return Autopilot(GRAVITY, JUMP_FORCE, GROUND_HEIGHT - PLAYER_SIZE, player_hitbox, obstacle_hitbox)
+
+def draw_ground_strip(surface, top, ground_color, grid_color, line_color):
+    """Draw the ground with its top edge at `top`; colours are slots when `surface` is indexed"""
+    pygame.draw.rect(surface, ground_color, (0, top, WIDTH, HEIGHT - GROUND_HEIGHT))
     
     # Add grid lines to ground
-    for x in range(0, WIDTH, 40):
-        pygame.draw.line(screen, (GROUND_COLOR[0] + 20, GROUND_COLOR[1] + 20, GROUND_COLOR[2] + 20), 
-                         (x, GROUND_HEIGHT), (x, HEIGHT), 1)
+    for x in range(0, WIDTH, GRID_SPACING):
+        pygame.draw.line(surface, grid_color, (x, top), (x, top + HEIGHT - GROUND_HEIGHT), 1)
     
     # Add neon line at the top of the ground
-    pygame.draw.line(screen, random.choice(NEON_COLORS), (0, GROUND_HEIGHT), (WIDTH, GROUND_HEIGHT), 2)
+    pygame.draw.line(surface, line_color, (0, top), (WIDTH, top), 2)
+
+GROUND_GRID_COLOR = (GROUND_COLOR[0] + 20, GROUND_COLOR[1] + 20, GROUND_COLOR[2] + 20)
+ground_layer = None  # Built on first use with --palette
+
+def draw_ground():
+    global ground_layer
+    line_color = random.choice(NEON_COLORS)
+    if not options.palette:
+        draw_ground_strip(screen, GROUND_HEIGHT, GROUND_COLOR, GROUND_GRID_COLOR, line_color)
+        return
+    if ground_layer is None:
+        ground_layer = PaletteLayer(indexed_surface((WIDTH, HEIGHT - GROUND_HEIGHT),
+                                                    (GROUND_COLOR, GROUND_GRID_COLOR, line_color)))
+        draw_ground_strip(ground_layer.surface, 0, GROUND_SLOT, GROUND_GRID_SLOT, GROUND_LINE_SLOT)
+    # The flickering neon edge is a single palette entry
+    ground_layer.set_color(GROUND_LINE_SLOT, line_color)
+    ground_layer.draw(screen, (0, GROUND_HEIGHT))
 
 def show_game_over(score, time_survived):
     overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
     overlay.fill((0, 0, 0, 150))  # Semi-transparent black
     screen.blit(overlay, (0, 0))
     
-    # Game Over text
-    font = pygame.font.SysFont(None, 72)
-    text = font.render("Game Over", True, (255, 0, 128))  # Neon pink
-    text_rect = text.get_rect(center=(WIDTH//2, HEIGHT//2 - 80))
+    # Glowing Game Over text
+    draw_glowing_text("Game Over", 72, (255, 0, 128), (WIDTH//2, HEIGHT//2 - 80))  # Neon pink
     
     # Score text
-    score_font = pygame.font.SysFont(None, 48)
+    score_font = get_font(48)
     score_text = score_font.render(f"Score: {score}", True, (255, 255, 0))  # Neon yellow
     score_rect = score_text.get_rect(center=(WIDTH//2, HEIGHT//2 - 20))
     
     # Time survived text
-    time_font = pygame.font.SysFont(None, 36)
+    time_font = get_font(36)
     time_text = time_font.render(f"Time: {time_survived:.1f}s", True, (0, 255, 128))  # Neon green
     time_rect = time_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 20))
     
     # Restart text
-    restart_font = pygame.font.SysFont(None, 36)
+    restart_font = get_font(36)
     restart_text = restart_font.render("Press R to restart", True, (0, 255, 255))  # Neon cyan
     restart_rect = restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 60))
     
-    # Add glow effect to Game Over text
-    glow_surf = pygame.Surface((text_rect.width + 20, text_rect.height + 20), pygame.SRCALPHA)
-    glow_surf.fill((0, 0, 0, 0))
-    pygame.draw.rect(glow_surf, (255, 0, 128, 100), glow_surf.get_rect(), 0, 10)
-    screen.blit(glow_surf, (text_rect.x - 10, text_rect.y - 10))
-    
-    # Draw all text
-    screen.blit(text, text_rect)
+    # Draw the rest of the text
     screen.blit(score_text, score_rect)
     screen.blit(time_text, time_rect)
     screen.blit(restart_text, restart_rect)
 
+def show_leaderboard(title, entries, x):
+    # A column of the best runs, with the run that just ended highlighted
+    font = get_font(22)
+    screen.blit(font.render(title, True, (255, 0, 255)), (x, 150))  # Neon purple
+    for i, (player_name, score, current) in enumerate(entries):
+        color = (255, 255, 0) if current else (200, 200, 220)
+        screen.blit(font.render(f"{i + 1}. {player_name[:10]}", True, color), (x, 175 + i * 20))
+        score_text = font.render(str(score), True, color)
+        screen.blit(score_text, score_text.get_rect(topright=(x + 150, 175 + i * 20)))
+
+def show_autopilot_indicator():
+    font = get_font(24)
+    text = font.render("AUTOPILOT", True, (255, 0, 255))  # Neon purple
+    screen.blit(text, text.get_rect(topright=(WIDTH - 10, 10)))
+
 def show_score_and_speed(score, time_score, game_speed):
     # Score
-    font = pygame.font.SysFont(None, 36)
+    font = get_font(36)
     score_text = font.render(f"Score: {score + time_score}", True, (0, 255, 255))  # Neon cyan
     screen.blit(score_text, (10, 10))
     
     # Time score
-    time_font = pygame.font.SysFont(None, 24)
+    time_font = get_font(24)
     time_text = time_font.render(f"Time: {time_score}", True, (255, 255, 0))  # Neon yellow
     screen.blit(time_text, (10, 50))
     
     # Speed
-    speed_font = pygame.font.SysFont(None, 24)
+    speed_font = get_font(24)
     speed_text = speed_font.render(f"Speed: {game_speed:.1f}x", True, (0, 255, 128))  # Neon green
     screen.blit(speed_text, (10, 80))
 
 def show_speed_up_notification():
-    font = pygame.font.SysFont(None, 36)
-    text = font.render("Speed Up!", True, (255, 0, 128))  # Neon pink
-    text_rect = text.get_rect(center=(WIDTH//2, 50))
-    
-    # Add glow effect
-    glow_surf = pygame.Surface((text_rect.width + 20, text_rect.height + 20), pygame.SRCALPHA)
-    glow_surf.fill((0, 0, 0, 0))
-    pygame.draw.rect(glow_surf, (255, 0, 128, 80), glow_surf.get_rect(), 0, 10)
-    screen.blit(glow_surf, (text_rect.x - 10, text_rect.y - 10))
-    
-    screen.blit(text, text_rect)
+    draw_glowing_text("Speed Up!", 36, (255, 0, 128), (WIDTH//2, 50))  # Neon pink
 
-async def main():
+def show_paused():
+    font = get_font(48)
+    text = font.render("PAUSED", True, (0, 255, 255))  # Neon cyan
+    screen.blit(text, text.get_rect(center=(WIDTH//2, HEIGHT//2)))
+
+def show_loading_indicator(progress):
+    # Small bar in the bottom right while the music and extra sounds stream in
+    font = get_font(18)
+    text = font.render("Loading audio", True, (0, 255, 255))  # Neon cyan
+    bar = pygame.Rect(WIDTH - 110, HEIGHT - 18, 100, 6)
+    screen.blit(text, text.get_rect(bottomright=(WIDTH - 10, bar.top - 4)))
+    pygame.draw.rect(screen, (0, 255, 255), bar, 1)
+    pygame.draw.rect(screen, (0, 255, 255), (bar.x, bar.y, int(bar.width * progress), bar.height))
+
+highscores = None
+
+def get_highscores():
+    """The high score store, opened on first use so importing this module creates no files"""
+    global highscores
+    if highscores is None:
+        # Imported here, as some Python builds (the browser's among them) have no sqlite3
+        from highscores import HighScoreStore
+        highscores = HighScoreStore(HIGHSCORE_PATH)
+        atexit.register(highscores.close)
+    return highscores
+
+def record_run(score, seed, level, duration, rows=5):
+    """Store a finished run and return the (today, this level) boards it belongs on"""
+    boards = []
+    try:
+        store = get_highscores()
+        # Query before adding, so the run is merged in exactly once whether
+        # or not the writer has stored it yet
+        for runs in (store.top_for_day(n=rows), store.top_for_level(seed, level, n=rows)):
+            entries = [(run[0], run[1], False) for run in runs]
+            entries.append((options.name, score, True))
+            entries.sort(key=lambda entry: entry[1], reverse=True)
+            boards.append(entries[:rows])
+        store.add(options.name, score, seed, duration, level)
+    except Exception as e:  # sqlite3.Error, or no sqlite3 in this Python build
+        print(f"Could not record high score: {e}")
+    return boards
+
+# Audio and debug tools live for the whole session so they survive restarts
+sound_manager = SoundManager()
+autopilot = create_autopilot()
+profiler = FrameProfiler()
+profile_capture = ProfileCapture.from_env()
+telemetry = TelemetryRecorder()
+alloc_tracker = AllocationTracker.from_env()
+scheduler = FrameScheduler(fps=60)
+particles = ParticleSystem(PARTICLE_COLORS, capacity=5000)
+# Runs on normal exit and after an uncaught exception, so crashes leave a trace
+atexit.register(telemetry.dump_run)
+
+async def play_round():
+    """Play one round; returns when the player restarts after a game over"""
     # Game variables
     game_speed = INITIAL_GAME_SPEED
-    player = Player()
-    obstacles = []
-    background = BackgroundEffect(game_speed)
-    sound_manager = SoundManager()
-    last_obstacle_time = 0
+    max_game_speed = options.max_speed or MAX_GAME_SPEED
+    player = Player(trail_max=options.trail or 10)
+    obstacles = ObstaclePool(capacity=32 * max(1, math.ceil(options.spawn_density)))
+    background = BackgroundEffect(game_speed, options.bg_lines or 15, options.bg_shapes or 10)
+    # A level file fixes the layout. Otherwise the level is random and only
+    # ghosts recorded on it show up, unless --race or --ghost asks to replay
+    # the level of the first ghost named (or of the personal best)
+    level = LevelFile(options.level) if options.level else None
+    seed, ghosts = (level.seed if level else None), []
+    if seed is None and not (options.race or options.ghost):
+        seed = random.randrange(2 ** 32)
+    # Beat sync lays the obstacles out on the music's beats, timed by play time
+    beat_grid = level is None and options.beat_sync
+    beat_interval = beat_offset = None
+    if beat_grid:
+        beat_interval, beat_offset = sound_manager.beat_timing()
+    # The same seed lays out another level under other settings, so ghosts and
+    # the level leaderboard only compare runs whose key matches too
+    if level is not None:
+        key = f"file {os.path.basename(options.level)}"
+    else:
+        key = level_key(options.patterns, options.spawn_density, max_game_speed, beat_interval, beat_offset)
+    if options.ghosts:
+        seed, ghosts = load_ghosts(find_ghosts(GHOST_DIR, options.ghost or ()), GROUND_HEIGHT - PLAYER_SIZE,
+                                   seed=seed, level_key=key, limit=options.ghosts)
+    if beat_grid:
+        level = BeatGrid(seed, 60000 / beat_interval, WIDTH - (player.x + player.size / 2),
+                         patterns=options.patterns, difficulty=scale_spawn_density('classic', options.spawn_density),
+                         max_speed=max_game_speed, offset_ms=beat_offset)
+    elif level is None:
+        level = LevelStream(seed=seed, patterns=options.patterns,
+                            difficulty=scale_spawn_density('classic', options.spawn_density),
+                            max_speed=max_game_speed)
+    recorder = GhostRecorder(level.seed, options.spawn_density, options.name, key)
+    leaderboards = []
+    scroll_distance = 0  # How far the world has scrolled, drives the level stream
     game_over = False
     obstacle_score = 0
     time_score = 0
-    min_obstacle_distance = 300  # Minimum distance between obstacles
     
     # Time tracking
-    start_time = pygame.time.get_ticks()
+    start_time = scheduler.now()
     current_game_time = 0
     last_speed_increase = 0
-    speed_increase_interval = 15000  # 15 seconds
     show_speed_notification = False
     speed_notification_time = 0
+    particles.clear()
+    sound_manager.beat_clock = (lambda: scheduler.now() - start_time) if beat_grid else None
+    # The music doesn't stop for a stall, so neither can a level laid out on its beats
+    scheduler.catch_up = bool(beat_grid)
     
-    # Start the music
-    sound_manager.start_music()
+    # Start the music; on the very first run the sounds are only loaded once
+    # the first frame is on screen and the music streams in after that
+    if sound_manager.music_file:
+        sound_manager.start_music()
     
     while True:
-        current_time = pygame.time.get_ticks()
+        profile_capture.poll()
+        profiler.begin_frame()
+        frame_start = time.perf_counter()
+        current_time = scheduler.now()
         
         # Handle events
         for event in pygame.event.get():
+            scheduler.handle_event(event)
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -663,76 +1362,151 @@ async def main():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE and not game_over:
                     player.jump(sound_manager)
+                if event.key == pygame.K_a:
+                    autopilot.toggle()
+                if event.key == pygame.K_F3:
+                    profiler.toggle()
+                if event.key == pygame.K_F11:
+                    toggle_fullscreen()
+                if event.key == pygame.K_F5:
+                    profile_capture.start("cprofile")
+                if event.key == pygame.K_F6:
+                    profile_capture.start("sample")
                 if event.key == pygame.K_r and game_over:
                     # Stop music before restarting
                     sound_manager.stop_music()
                     # Restart the game
-                    return main()
+                    for ghost in ghosts:
+                        ghost.close()
+                    if options.level:
+                        level.close()
+                    return
+        profiler.mark("events")
+        
+        # Hold the music and the game while the window is unfocused or hidden
+        sound_manager.set_paused(scheduler.paused)
+        running = not game_over and not scheduler.paused
         
         # Update music and get beat information
         beat_occurred, beat_count = sound_manager.update()
         
         # Update game time if not game over
-        if not game_over:
+        if running:
             current_game_time = (current_time - start_time) / 1000  # Convert to seconds
             time_score = int(current_game_time * 2)  # 2 points per second
             
             # Check if it's time to increase speed
-            if current_game_time - last_speed_increase >= speed_increase_interval / 1000:
-                if game_speed < MAX_GAME_SPEED:
-                    game_speed += 0.5
-                    last_speed_increase = current_game_time
+            if current_game_time - last_speed_increase >= SPEED_STEP_SECONDS:
+                if game_speed < max_game_speed:
+                    game_speed = min(game_speed + SPEED_STEP, max_game_speed)
+                    # Step on the schedule rather than the frame, like BeatGrid.speed_at()
+                    last_speed_increase += SPEED_STEP_SECONDS
                     show_speed_notification = True
                     speed_notification_time = current_time
                     sound_manager.play_sound('speed_up')
         
         # Update background with beat information
-        background.update(game_speed, beat_occurred)
+        if not scheduler.paused:
+            background.update(game_speed, beat_occurred)
         
         # Change player color on every 4th beat
         if beat_occurred and beat_count % 4 == 0 and not game_over:
             player.color = random.choice(NEON_COLORS)
         
-        # Draw background
-        background.draw()
+        # Sparks fly up from the ground on every beat
+        if beat_occurred and running:
+            for _ in range(3):
+                particles.burst(random.randint(0, WIDTH), GROUND_HEIGHT, 12, 5,
+                                (SPARK_COLOR, random.randrange(len(NEON_COLORS))),
+                                life=30, spread=math.pi / 3)
         
-        if not game_over:
-            # Update player
+        if running:
+            # Let the autopilot press jump on its planned frame
+            if autopilot.enabled and autopilot.should_jump(player, obstacles, game_speed):
+                player.jump(sound_manager)
+            
+            # Update player, kicking up dust when it lands
+            was_jumping = player.jumping
             player.update()
+            if was_jumping and not player.jumping:
+                particles.burst(player.x + player.size / 2, GROUND_HEIGHT, 20, 2.5, (DUST_COLOR,),
+                                life=25, spread=math.pi * 0.8)
+            # A tick per update, except that a beat grid scrolls by play time, so
+            # there runs are recorded and replayed at TICKS_PER_SECOND of play time
+            # and ghosts stay on their obstacles whatever the frame rate
+            ticks = recorder.ticks + 1
+            if beat_grid:
+                ticks = int((current_time - start_time) * TICKS_PER_SECOND / 1000) + 1
+            while recorder.ticks < ticks:
+                recorder.record(player.y)
+                for ghost in ghosts:
+                    ghost.advance()
             
-            # Generate obstacles
-            can_spawn = len(obstacles) == 0 or (obstacles[-1].x < WIDTH - min_obstacle_distance)
-            if can_spawn and current_time - last_obstacle_time > random.randint(1500, 2500):
-                shape_type = "rect" if random.random() < 0.7 else "triangle"
-                obstacles.append(Obstacle(WIDTH, shape_type, game_speed))
-                last_obstacle_time = current_time
+            # Spawn whatever the level stream has reached, placed at the exact
+            # offset past the right edge so spacing matches the generated layout
+            spawn = level.pop_due(scroll_distance)
+            while spawn is not None:
+                obstacles.spawn(WIDTH - (scroll_distance - spawn.position), spawn.shape_type,
+                                game_speed, spawn.width, spawn.height)
+                spawn = level.pop_due(scroll_distance)
+            # One new size per frame, seconds before it reaches the screen
+            bake_obstacle_sprites(level.peek(OBSTACLE_BAKE_AHEAD), limit=1)
             
-            # Update obstacles
-            for obstacle in obstacles[:]:
-                obstacle.update(game_speed)
-                if obstacle.is_off_screen():
-                    obstacles.remove(obstacle)
-                    obstacle_score += 1
+            # Update obstacles and count the ones that scrolled off screen. A beat
+            # grid scrolls by however far the play time moved, so a dropped frame
+            # can't leave the obstacles behind the music.
+            step = level.distance_at(current_time - start_time) - scroll_distance if beat_grid else game_speed
+            obstacle_score += obstacles.update(step)
+            scroll_distance += step
             
             # Check collisions
             for obstacle in obstacles:
-                if check_collision(player, obstacle):
+                if swept_collision(player, obstacle) is not None:
                     game_over = True
                     sound_manager.play_sound('crash')
+            if game_over:
+                # Explode the player in its own colour
+                color = NEON_COLORS.index(player.color) if player.color in NEON_COLORS else SPARK_COLOR
+                particles.burst(player.x + player.size / 2, player.y + player.size / 2, 150, 8,
+                                (color, color, SPARK_COLOR))
+                save_ghost(recorder, obstacle_score + time_score)
+                leaderboards = record_run(obstacle_score + time_score, level.seed, key, current_game_time)
+        
+        # Particles keep moving after a crash so the explosion plays out
+        if not scheduler.paused:
+            particles.update()
+        profiler.mark("update")
+        update_end = time.perf_counter()
+        
+        # Draw background
+        background.draw()
+        profiler.mark("background")
         
         # Draw everything
         draw_ground()
+        profiler.mark("ground")
         
         # Draw obstacles
         for obstacle in obstacles:
             obstacle.draw()
+        profiler.mark("obstacles")
+        
+        # Draw the ghosts behind the player
+        draw_ghosts(ghosts, player.x)
         
         # Draw player
         player.draw()
+        profiler.mark("player")
+        
+        particles.draw(screen)
+        profiler.mark("particles")
         
         # Show score and speed
         show_score_and_speed(obstacle_score, time_score, game_speed / INITIAL_GAME_SPEED)
         
+        if autopilot.enabled:
+            show_autopilot_indicator()
+        
         # Show speed up notification if needed
         if show_speed_notification and current_time - speed_notification_time < 2000:
             show_speed_up_notification()
@@ -741,12 +1515,111 @@ async def main():
         
         if game_over:
             show_game_over(obstacle_score + time_score, current_game_time)
+            for (title, x), entries in zip((("Today", 20), ("This level", WIDTH - 170)), leaderboards):
+                show_leaderboard(title, entries, x)
+        elif scheduler.paused:
+            show_paused()
+        
+        if not sound_manager.loaded or sound_manager.pending:
+            show_loading_indicator(sound_manager.loading_progress())
+        profiler.mark("hud")
+        
+        # Only build the extra lines when the overlay is showing
+        if profiler.enabled:
+            profiler.draw(screen, (obstacles.memory_report(),
+                                 f"particles {len(particles)}/{particles.capacity}"))
         
         # Update the display
-        pygame.display.flip()
-        clock.tick(60)
-        await asyncio.sleep(0)
+        present_frame()
+        profiler.mark("flip")
+        draw_end = time.perf_counter()
+        
+        if not sound_manager.loaded:
+            startup_trace.mark("first frame")
+            sound_manager.load()
+            startup_trace.mark("critical audio")
+            bake_obstacle_sprites(level.peek(OBSTACLE_BAKE_AHEAD))
+            startup_trace.mark("obstacle sprites")
+            bake_halos()
+            startup_trace.mark("halos")
+            startup_trace.report()
+            sound_manager.stream_deferred()
+        
+        await scheduler.next_frame()
+        profiler.mark("wait")
+        
+        frame_end = time.perf_counter()
+        telemetry.record((frame_end - frame_start) * 1000, (update_end - frame_start) * 1000,
+                         (draw_end - update_end) * 1000, len(obstacles), game_speed, beat_occurred)
+        alloc_tracker.end_frame()
+
+async def main():
+    # Each round returns when the player restarts, so restarts don't nest
+    while True:
+        await play_round()
+
+# Entity counts used by --stress unless overridden by the individual flags
+STRESS_PRESET = {'bg_lines': 300, 'bg_shapes': 200, 'trail': 100,
+                 'spawn_density': 4.0, 'max_speed': 30}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cube Runner '84")
+    parser.add_argument("--startup-trace", action="store_true",
+                        help="Print a timeline of startup milestones")
+    stress = parser.add_argument_group("stress testing")
+    stress.add_argument("--stress", action="store_true",
+                        help="Raise every entity count far beyond the defaults")
+    stress.add_argument("--bg-lines", type=int, help="Background lines (default 15)")
+    stress.add_argument("--bg-shapes", type=int, help="Background shapes (default 10)")
+    stress.add_argument("--trail", type=int, help="Player trail length (default 10)")
+    stress.add_argument("--spawn-density", type=float,
+                        help="Multiplier on obstacle spawn density (default 1)")
+    stress.add_argument("--max-speed", type=float,
+                        help=f"Game speed cap (default {MAX_GAME_SPEED})")
+    parser.add_argument("--scale", choices=SCALE_MODES, default="smooth",
+                        help="How the 800x400 picture is scaled to the window (default smooth)")
+    parser.add_argument("--fullscreen", action="store_true", help="Start in fullscreen (F11 toggles)")
+    parser.add_argument("--palette", action="store_true",
+                        help="Draw the background, ground and player from 8-bit layers "
+                             "recoloured through their palettes (cheaper on slow machines)")
+    parser.add_argument("--beat-sync", action="store_true",
+                        help="Time obstacles to reach you on the beats of the music")
+    parser.add_argument("--music", metavar="PATH",
+                        help="Play this WAV or OGG instead of the built-in loop; "
+                             "run music_analysis.py on it first so the beats line up")
+    parser.add_argument("--patterns", choices=sorted(PATTERN_SETS), default='varied',
+                        help="Obstacle patterns of generated levels; 'classic' has only boxes "
+                             "and spikes (default varied)")
+    parser.add_argument("--level", metavar="PATH",
+                        help="Play a level file built with level_file.py instead of a generated level")
+    parser.add_argument("--name", default="player",
+                        help="Name stored with your high scores and ghosts")
+    parser.add_argument("--ghosts", type=int, default=20,
+                        help="Most ghost runs to race at once, 0 to turn them off (default 20)")
+    parser.add_argument("--ghost", action="append", metavar="PATH",
+                        help=f"Replay the level this ghost file was recorded on and race it "
+                             f"with the ones in {GHOST_DIR}/ (repeatable)")
+    parser.add_argument("--race", action="store_true",
+                        help="Replay the level your best ghost was recorded on instead of a random one")
+    # Ignore anything else, browsers and launchers may pass their own arguments
+    options, _ = parser.parse_known_args(argv)
+    
+    for name, value in STRESS_PRESET.items():
+        if options.stress and getattr(options, name) is None:
+            setattr(options, name, value)
+    if options.spawn_density is None:
+        options.spawn_density = 1.0
+    return options
+
+# Defaults for when the game is driven from another module
+options = parse_args([])
 
-asyncio.run(main())
+if __name__ == "__main__":
+    options = parse_args()
+    # Always on in the browser, where load time is what players notice most
+    startup_trace.enabled = options.startup_trace or sys.platform == "emscripten"
+    sound_manager.custom_music = options.music
+    init_display()
+    asyncio.run(main())
 
 
@@ -0,0 +1,181 @@
+"""Offline onset detection and tempo estimation for the music in sounds/
+
+Usage: python music_analysis.py [AUDIO ...]
+
+Analyses every WAV and OGG under sounds/ (or the files given) and writes a
+beat map next to each one (see beat_map.py), which the game loads instead
+of assuming MUSIC_BPM. Needs numpy; the game itself does not.
+
+Onsets come from spectral flux: the summed increase in log magnitude
+between overlapping FFT frames, with peaks picked against a moving average.
+The tempo is the strongest autocorrelation lag of that onset envelope
+between 60 and 200 BPM, weighted towards 120 BPM so that half and double
+tempo only win when they are clearly stronger. The beat phase is the
+offset whose comb of beats collects the most onset energy, and a least
+squares fit of the onsets near each beat refines both.
+"""
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from beat_map import BeatMap, path_for, write_beat_map
+
+FRAME = 2048  # FFT size in samples
+HOP = 512     # Samples between frames, about 11.6 ms at 44.1 kHz
+MIN_BPM, MAX_BPM = 60, 200
+PREFERRED_BPM = 120
+AUDIO_EXTENSIONS = (".wav", ".ogg")
+
+
+def read_audio(path):
+    """Mono samples in [-1, 1] and their sample rate"""
+    try:
+        with wave.open(path, "rb") as f:
+            width, channels, rate = f.getsampwidth(), f.getnchannels(), f.getframerate()
+            data = f.readframes(f.getnframes())
+        if width == 1:
+            samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+        elif width in (2, 4):
+            dtype = np.dtype(f"<i{width}")
+            samples = np.frombuffer(data, dtype).astype(np.float32) / np.iinfo(dtype).max
+        else:
+            raise wave.Error(f"{width * 8}-bit samples")
+        return samples.reshape(-1, channels).mean(axis=1), rate
+    except (wave.Error, EOFError):
+        pass
+    # Compressed or unusual formats go through SDL_mixer's decoders
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    rate, size, _ = pygame.mixer.get_init()
+    samples = pygame.sndarray.array(pygame.mixer.Sound(path)).astype(np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return samples / float(2 ** (abs(size) - 1)), rate
+
+
+def onset_envelope(samples, rate):
+    """Spectral flux per frame with its local average removed; frame i is centred on i * HOP"""
+    padded = np.pad(samples, FRAME // 2, mode="reflect")
+    frames = sliding_window_view(padded, FRAME)[::HOP] * np.hanning(FRAME).astype(np.float32)
+    spectrum = np.log1p(100 * np.abs(np.fft.rfft(frames, axis=1)))
+    flux = np.concatenate(([0.0], np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)))
+    # Subtract a moving average of about 0.4 s so sustained loud passages don't read as onsets
+    width = max(1, int(0.4 * rate / HOP)) | 1
+    local = np.convolve(np.pad(flux, width // 2, mode="edge"), np.ones(width) / width, mode="valid")
+    envelope = np.maximum(flux - local, 0)
+    return envelope / (envelope.max() or 1)
+
+
+def pick_onsets(envelope, rate):
+    """Onset times in ms and strengths in (0, 1]"""
+    radius = max(1, int(0.05 * rate / HOP))  # A peak must be the largest within 50 ms
+    windows = sliding_window_view(np.pad(envelope, radius), 2 * radius + 1)
+    threshold = envelope.mean() + 0.5 * envelope.std()
+    peaks = np.flatnonzero((envelope == windows.max(axis=1)) & (envelope > threshold))
+    # Parabolic interpolation between neighbouring frames for sub-hop timing
+    left = envelope[np.maximum(peaks - 1, 0)]
+    right = envelope[np.minimum(peaks + 1, len(envelope) - 1)]
+    middle = envelope[peaks]
+    curvature = left - 2 * middle + right
+    shift = np.where(curvature < 0, 0.5 * (left - right) / np.where(curvature < 0, curvature, -1), 0)
+    return (peaks + shift) * HOP * 1000 / rate, middle
+
+
+def estimate_period(envelope, rate):
+    """Beat period in frames from the autocorrelation of the onset envelope"""
+    # Peaks are only a frame or two wide, so blur them a little or a period
+    # that falls between whole frames would hardly correlate with itself
+    envelope = np.convolve(envelope, np.hanning(7), mode="same")
+    n = len(envelope)
+    spectrum = np.fft.rfft(envelope - envelope.mean(), 2 * n)
+    autocorrelation = np.fft.irfft(np.abs(spectrum) ** 2)[:n]
+    frames_per_minute = 60 * rate / HOP
+    lags = np.arange(max(1, int(frames_per_minute / MAX_BPM)), min(n - 1, int(frames_per_minute / MIN_BPM) + 1))
+    if len(lags) == 0:
+        raise ValueError("too short to estimate a tempo")
+    # Log-normal prior, one octave wide, centred on the preferred tempo
+    prior = np.exp(-0.5 * np.log2(frames_per_minute / lags / PREFERRED_BPM) ** 2)
+    # A real beat period also repeats at two and four beats, while the lag
+    # between off-beat notes mostly doesn't
+    harmonics = sum(autocorrelation[np.minimum(lags * k, n - 1)] / k for k in (1, 2, 4))
+    best = lags[np.argmax(harmonics * prior)]
+    a, b, c = autocorrelation[best - 1:best + 2]
+    curvature = a - 2 * b + c
+    return best + (0.5 * (a - c) / curvature if curvature < 0 else 0)
+
+
+def best_phase(envelope, period):
+    """Offset in frames of the beat comb that lands on the most onset energy"""
+    phases = np.arange(0, period, 0.25)
+    teeth = np.arange(0, len(envelope) - 1 - period, period)
+    positions = phases[:, None] + teeth[None, :]
+    return phases[np.argmax(np.interp(positions, np.arange(len(envelope)), envelope).sum(axis=1))]
+
+
+def analyse(samples, rate):
+    """BeatMap of a mono track"""
+    duration_ms = len(samples) * 1000 / rate
+    envelope = onset_envelope(samples, rate)
+    onsets, strengths = pick_onsets(envelope, rate)
+    period = estimate_period(envelope, rate)
+    beat_ms = period * HOP * 1000 / rate
+    offset_ms = best_phase(envelope, period) * HOP * 1000 / rate
+
+    # Refine with a line fitted through the onsets near the grid: first within
+    # an eighth of a beat, which leaves out off-beat notes down to sixteenths,
+    # then within a sixteenth of the first fit to drop stray detections
+    for tolerance in (8, 16):
+        index = np.round((onsets - offset_ms) / beat_ms)
+        near = np.abs(onsets - (offset_ms + index * beat_ms)) < beat_ms / tolerance
+        if np.count_nonzero(near) < 4 or len(np.unique(index[near])) < 2:
+            break
+        beat_ms, offset_ms = np.polyfit(index[near], onsets[near], 1, w=strengths[near])
+    offset_ms %= beat_ms
+    beats = np.arange(offset_ms, duration_ms, beat_ms)
+    return BeatMap(60000 / beat_ms, offset_ms, duration_ms, beats, onsets,
+                   np.clip(np.round(strengths * 255), 1, 255).astype(np.uint8).tobytes())
+
+
+def analyse_file(path):
+    """Analyse `path` and write its beat map; returns (beat map, map size in bytes)"""
+    samples, rate = read_audio(path)
+    beat_map = analyse(samples, rate)
+    return beat_map, write_beat_map(path_for(path), beat_map)
+
+
+def find_audio(directory="sounds"):
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths += [os.path.join(root, name) for name in sorted(names)
+                  if name.lower().endswith(AUDIO_EXTENSIONS)]
+    return paths
+
+
+def main():
+    paths = sys.argv[1:] or find_audio()
+    if not paths:
+        print("No audio found in sounds/")
+        return 1
+    failed = 0
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            beat_map, size = analyse_file(path)
+        except (OSError, ValueError, RuntimeError, wave.Error) as e:  # pygame.error is a RuntimeError
+            print(f"{path}: {e}")
+            failed += 1
+            continue
+        print(f"{path}: {beat_map.bpm:.2f} BPM, first beat at {beat_map.offset_ms:.1f} ms, "
+              f"{len(beat_map.beats)} beats, {len(beat_map.onsets)} onsets, {size} bytes "
+              f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
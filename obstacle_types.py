@@ -0,0 +1,50 @@
+"""Obstacle types declared as data: geometry, hitbox, glow and spawn weight
+
+Every type is drawn and collided with by the same code. The game bakes a
+type's sprite, glow halo and collision mask for each size before the first
+obstacle of that size reaches the screen, so adding a type only means adding
+an entry to OBSTACLE_TYPES. Level files store a type as its index in that
+table, so new types go at the end.
+"""
+from collections import namedtuple
+
+ObstacleType = namedtuple('ObstacleType', [
+    'name',
+    'points',   # Polygon vertices as fractions of the obstacle's width and height
+    'width',    # (min, max) in pixels
+    'height',   # (min, max) in pixels, or None for as tall as it is wide
+    'inset',    # Pixels trimmed off every side of the collision shape
+    'glow',     # (radius, low): halo reach in pixels, and the fraction of full brightness the pulse dims it to
+    'weight',   # Relative chance of being picked by weighted patterns
+    'lift',     # Pixels between the ground and the obstacle's bottom edge
+    'motion',   # (amplitude, rate): vertical bob in pixels, phase step in radians per update
+])
+
+BOX = ((0, 0), (1, 0), (1, 1), (0, 1))
+SPIKE = ((0, 1), (1, 1), (0.5, 0))
+DIAMOND = ((0.5, 0), (1, 0.5), (0.5, 1), (0, 0.5))
+
+OBSTACLE_TYPES = {obstacle_type.name: obstacle_type for obstacle_type in (
+    # The original two shapes keep their names so existing levels still load
+    ObstacleType('rect', BOX, (20, 40), (20, 60), 0, (10, 0.5), 6, 0, (0, 0)),
+    ObstacleType('triangle', SPIKE, (20, 40), None, 0, (10, 0.5), 3, 0, (0, 0)),
+    ObstacleType('pillar', BOX, (16, 24), (80, 120), 0, (10, 0.5), 1, 0, (0, 0)),
+    # High enough to run under, low enough to hit mid-jump
+    ObstacleType('floating', BOX, (40, 80), (16, 24), 0, (8, 0.5), 1, 55, (0, 0)),
+    ObstacleType('hazard', DIAMOND, (24, 32), None, 3, (12, 0.25), 1, 8, (60, 0.06)),
+)}
+TYPE_NAMES = tuple(OBSTACLE_TYPES)
+
+
+def random_size(obstacle_type, rng):
+    """(width, height) drawn from the type's size ranges"""
+    width = rng.randint(*obstacle_type.width)
+    height = rng.randint(*obstacle_type.height) if obstacle_type.height else width
+    return width, height
+
+
+def polygon(obstacle_type, width, height, inset=0):
+    """The type's outline in pixels for a width x height obstacle, shrunk by `inset` on every side"""
+    right, bottom = width - 1 - inset, height - 1 - inset
+    return [(inset + fx * (right - inset), inset + fy * (bottom - inset))
+            for fx, fy in obstacle_type.points]
@@ -0,0 +1,53 @@
+"""8-bit surfaces whose colours change through their palette instead of being redrawn
+
+Pictures that only ever change colour (the background grid, the ground, the
+player's square) are drawn once with palette slot numbers as colours. After
+that, recolouring one of them means rewriting a palette entry, which costs
+the same however many pixels use the slot. Blitting an 8-bit surface onto
+the true-colour framebuffer looks every pixel up in its palette, so the
+colours on screen are exact and nothing downstream has to know.
+"""
+import pygame
+
+PALETTE_SIZE = 256
+KEY_SLOT = 0  # Transparent slot of colour-keyed sprites
+
+
+def indexed_surface(size, colors=(), colorkey=False):
+    """A blank 8-bit surface with `colors` in its first palette slots
+
+    With `colorkey` slot 0 is transparent, so shapes drawn in other slots
+    blit without a background.
+    """
+    surface = pygame.Surface(size, depth=8)
+    colors = list(colors)
+    surface.set_palette(colors + [(0, 0, 0)] * (PALETTE_SIZE - len(colors)))
+    surface.fill(KEY_SLOT)
+    if colorkey:
+        surface.set_colorkey(KEY_SLOT)
+    return surface
+
+
+class PaletteLayer:
+    """An 8-bit picture recoloured by slot
+
+    Draw into `surface` once, using slot numbers as colours, then call
+    set_color() whenever a slot's colour should change. Unchanged colours
+    are skipped, so a layer that isn't animating costs nothing but its blit.
+    """
+    def __init__(self, surface):
+        self.surface = surface
+        self.colors = [tuple(color)[:3] for color in surface.get_palette()]
+
+    def set_color(self, slot, color):
+        color = tuple(color)
+        if self.colors[slot] != color:
+            self.colors[slot] = color
+            self.surface.set_palette_at(slot, color)
+
+    def rotated(self, angle):
+        """A rotated copy with its own palette; slots and colour key carry over"""
+        return PaletteLayer(pygame.transform.rotate(self.surface, angle))
+
+    def draw(self, target, position=(0, 0)):
+        target.blit(self.surface, position)
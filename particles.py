@@ -0,0 +1,145 @@
+"""Fixed-capacity particle system for crash, landing and beat effects
+
+Particles live in preallocated arrays (position, velocity, life, colour
+index), packed so the live ones are always the first `count` entries. The
+updates run on numpy when it is installed and fall back to plain loops
+over the same arrays when it isn't. Sprites are baked once per colour and
+size, and the whole system is drawn with a single Surface.blits() call.
+"""
+import math
+import random
+from array import array
+
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GRAVITY = 0.25
+STAGES = 4        # Sprite sizes per colour, from nearly dead to freshly spawned
+MAX_RADIUS = 4
+
+
+class ParticleSystem:
+    def __init__(self, colors, capacity=5000, max_life=60, use_numpy=None):
+        self.colors = list(colors)
+        self.capacity = capacity
+        self.max_life = max_life
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        if self.use_numpy:
+            self.rng = numpy.random.default_rng()
+            self.x, self.y, self.vx, self.vy, self.life = (
+                numpy.zeros(capacity, numpy.float32) for _ in range(5))
+            self.color = numpy.zeros(capacity, numpy.int32)
+        else:
+            self.x, self.y, self.vx, self.vy, self.life = (
+                array('f', bytes(4 * capacity)) for _ in range(5))
+            self.color = array('i', bytes(4 * capacity))
+        self.count = 0
+        self.dropped = 0  # Particles refused because the arrays were full
+        self.sprites = self._bake_sprites()
+
+    def _bake_sprites(self):
+        """One sprite per (colour, stage), indexed by colour * STAGES + stage"""
+        sprites = []
+        size = MAX_RADIUS * 2
+        for color in self.colors:
+            for stage in range(STAGES):
+                radius = 1 + stage * (MAX_RADIUS - 1) / (STAGES - 1)
+                alpha = 90 + stage * 165 // (STAGES - 1)
+                sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+                pygame.draw.circle(sprite, (*color, alpha), (MAX_RADIUS, MAX_RADIUS), radius)
+                sprites.append(sprite)
+        return sprites
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def burst(self, x, y, count, speed, colors, life=None, angle=-math.pi / 2, spread=math.tau):
+        """Emit up to `count` particles from (x, y) in a cone around `angle`
+
+        `colors` are indices into the colour list given to the constructor.
+        Whatever doesn't fit in the free capacity is dropped.
+        """
+        life = life or self.max_life
+        n = min(count, self.capacity - self.count)
+        self.dropped += count - n
+        if n <= 0:
+            return
+        start, end = self.count, self.count + n
+        low, high = angle - spread / 2, angle + spread / 2
+        if self.use_numpy:
+            angles = self.rng.uniform(low, high, n)
+            speeds = self.rng.uniform(speed * 0.3, speed, n)
+            self.x[start:end] = x
+            self.y[start:end] = y
+            self.vx[start:end] = numpy.cos(angles) * speeds
+            self.vy[start:end] = numpy.sin(angles) * speeds
+            self.life[start:end] = self.rng.uniform(life / 2, life, n)
+            self.color[start:end] = self.rng.choice(colors, n)
+        else:
+            for i in range(start, end):
+                a = random.uniform(low, high)
+                s = random.uniform(speed * 0.3, speed)
+                self.x[i] = x
+                self.y[i] = y
+                self.vx[i] = math.cos(a) * s
+                self.vy[i] = math.sin(a) * s
+                self.life[i] = random.uniform(life / 2, life)
+                self.color[i] = random.choice(colors)
+        self.count = end
+
+    def update(self):
+        """Advance every particle one frame and drop the dead ones"""
+        n = self.count
+        if not n:
+            return
+        if self.use_numpy:
+            self.vy[:n] += GRAVITY
+            self.x[:n] += self.vx[:n]
+            self.y[:n] += self.vy[:n]
+            self.life[:n] -= 1
+            alive = self.life[:n] > 0
+            if not alive.all():
+                # Pack the survivors into the front of the arrays
+                keep = numpy.flatnonzero(alive)
+                for field in (self.x, self.y, self.vx, self.vy, self.life, self.color):
+                    field[:len(keep)] = field[keep]
+                self.count = len(keep)
+            return
+
+        x, y, vx, vy, life, color = self.x, self.y, self.vx, self.vy, self.life, self.color
+        i = 0
+        while i < n:
+            life[i] -= 1
+            if life[i] <= 0:
+                # Swap the last live particle into this slot
+                n -= 1
+                x[i], y[i], vx[i], vy[i], life[i], color[i] = x[n], y[n], vx[n], vy[n], life[n], color[n]
+                continue
+            vy[i] += GRAVITY
+            x[i] += vx[i]
+            y[i] += vy[i]
+            i += 1
+        self.count = n
+
+    def draw(self, surface):
+        n = self.count
+        if not n:
+            return
+        scale = STAGES / self.max_life
+        if self.use_numpy:
+            stage = numpy.minimum((self.life[:n] * scale).astype(numpy.int32), STAGES - 1)
+            index = (self.color[:n] * STAGES + stage).tolist()
+            xs = (self.x[:n] - MAX_RADIUS).astype(numpy.int32).tolist()
+            ys = (self.y[:n] - MAX_RADIUS).astype(numpy.int32).tolist()
+        else:
+            index = [self.color[i] * STAGES + min(int(self.life[i] * scale), STAGES - 1) for i in range(n)]
+            xs = [int(self.x[i]) - MAX_RADIUS for i in range(n)]
+            ys = [int(self.y[i]) - MAX_RADIUS for i in range(n)]
+        surface.blits(zip(map(self.sprites.__getitem__, index), zip(xs, ys)), doreturn=False)
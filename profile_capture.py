@@ -0,0 +1,182 @@
+"""Capture a profile of the running game for a few seconds and write it to disk
+
+Set CUBE_RUNNER_PROFILE=cprofile:10 (or sample:10) to capture the first ten
+seconds of gameplay, or press F5 (cProfile) / F6 (sampling) in game. Files
+land in profiles/ with a timestamped name:
+
+    *.pstats     cProfile data, open with `python -m pstats` or snakeviz
+    *.collapsed  one "frame;frame;frame count" line per stack, the input
+                 format of flamegraph.pl and speedscope
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+MODES = ("cprofile", "sample")
+
+
+def _frame_label(filename, line, name):
+    # Collapsed stacks use ';' as the separator and a trailing count
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":").replace(" ", "_")
+
+
+def collapsed_from_stats(stats, min_us=1):
+    """Expand a cProfile call graph into collapsed stacks, in microseconds
+
+    cProfile only records caller -> callee edges, so each function's time is
+    split across the paths that reach it in proportion to the cumulative time
+    on each edge.
+    """
+    children = defaultdict(dict)
+    roots = []
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            children[caller][func] = edge[3]
+    lines = Counter()
+
+    def walk(func, path, on_stack, budget):
+        _, _, self_time, cumulative, _ = stats.stats[func]
+        if cumulative <= 0 or budget * 1e6 < min_us or len(path) > 64:
+            return
+        scale = min(budget / cumulative, 1.0)
+        label = ";".join(_frame_label(*f) for f in path)
+        lines[label] += self_time * scale * 1e6
+        for child, edge_time in children[func].items():
+            if child not in on_stack:
+                on_stack.add(child)
+                walk(child, path + [child], on_stack, edge_time * scale)
+                on_stack.discard(child)
+
+    for root in roots:
+        walk(root, [root], {root}, stats.stats[root][3])
+    return {stack: int(us) for stack, us in lines.items() if int(us) >= min_us}
+
+
+class StackSampler:
+    """Samples the main thread's Python stack from a background thread"""
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.counts = Counter()
+        self.target = threading.main_thread().ident
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+
+class ProfileCapture:
+    """Runs one capture at a time and writes it out when the time is up"""
+    def __init__(self, output_dir="profiles"):
+        self.output_dir = output_dir
+        self.mode = None
+        self.deadline = 0.0
+        self.profile = None
+        self.sampler = None
+        self.pending = None
+
+    @classmethod
+    def from_env(cls, variable="CUBE_RUNNER_PROFILE"):
+        """Queue a capture described as "mode:seconds" in the environment
+
+        A value that doesn't parse is reported and ignored, so a typo can't
+        stop the game from starting.
+        """
+        capture = cls()
+        spec = os.environ.get(variable)
+        if spec:
+            mode, _, seconds = spec.partition(":")
+            mode = mode.strip().lower() or "cprofile"
+            try:
+                seconds = float(seconds or 10)
+            except ValueError:
+                seconds = None
+            if mode not in MODES or seconds is None or not 0 < seconds < float("inf"):
+                print(f"Ignoring {variable}={spec!r}: expected one of {', '.join(MODES)} "
+                      f"and a number of seconds, like cprofile:10")
+            else:
+                capture.pending = (mode, seconds)
+        return capture
+
+    @property
+    def active(self):
+        return self.mode is not None
+
+    def start(self, mode="cprofile", seconds=10):
+        if self.active:
+            return
+        if mode not in MODES:
+            print(f"Unknown profile mode {mode!r}, expected one of {', '.join(MODES)}")
+            return
+        if mode == "sample":
+            if not hasattr(sys, "_current_frames") or sys.platform == "emscripten":
+                print("Sampling profiler needs threads, falling back to cProfile")
+                mode = "cprofile"
+            else:
+                self.sampler = StackSampler()
+                self.sampler.start()
+        if mode == "cprofile":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.mode = mode
+        self.deadline = time.perf_counter() + seconds
+        print(f"Profiling ({mode}) for {seconds:g}s")
+
+    def poll(self):
+        """Call once per frame: starts a queued capture and finishes an expired one"""
+        if self.pending:
+            self.start(*self.pending)
+            self.pending = None
+        elif self.mode is not None and time.perf_counter() >= self.deadline:
+            return self.stop()
+        return None
+
+    def stop(self):
+        """End the capture and return the paths that were written"""
+        if not self.active:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, time.strftime(f"profile-%Y%m%d-%H%M%S-{self.mode}"))
+        paths = []
+        if self.mode == "cprofile":
+            self.profile.disable()
+            stats = pstats.Stats(self.profile)
+            stats.dump_stats(base + ".pstats")
+            paths.append(base + ".pstats")
+            collapsed = collapsed_from_stats(stats)
+            self.profile = None
+        else:
+            self.sampler.stop()
+            collapsed = self.sampler.counts
+            self.sampler = None
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in sorted(collapsed.items()):
+                f.write(f"{stack} {count}\n")
+        paths.append(base + ".collapsed")
+        self.mode = None
+        print("Profile written to " + ", ".join(paths))
+        return paths
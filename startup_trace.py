@@ -0,0 +1,46 @@
+"""Timeline of startup milestones, printed with --startup-trace"""
+import sys
+import time
+
+# Taken when this module is first imported, which main.py does before pygame
+PROCESS_START = time.perf_counter()
+
+
+def page_time_ms():
+    """Milliseconds since the browser started loading the page, or None off the web"""
+    if sys.platform != "emscripten":
+        return None
+    try:
+        import platform  # pygbag's platform module exposes the JavaScript window
+        return platform.window.performance.now()
+    except Exception:
+        return None
+
+
+class StartupTrace:
+    def __init__(self):
+        self.enabled = False
+        self.marks = []
+
+    def mark(self, label):
+        """Record a milestone; only the first occurrence of each label counts"""
+        # Always recorded (there are only a handful), so marks made before the
+        # command line is parsed still show up in the report
+        if any(name == label for name, _ in self.marks):
+            return
+        self.marks.append((label, time.perf_counter()))
+
+    def report(self):
+        if not self.enabled or not self.marks:
+            return
+        print("Startup timeline (ms since main.py started):")
+        page_now = page_time_ms()
+        if page_now is not None:
+            # Time the page spent downloading and booting Python before main.py ran
+            started = page_now - (time.perf_counter() - PROCESS_START) * 1000
+            print(f"  page load to main.py: {started:.1f} ms; to playable: "
+                  f"{started + (self.marks[-1][1] - PROCESS_START) * 1000:.1f} ms")
+        previous = PROCESS_START
+        for label, when in self.marks:
+            print(f"  {(when - PROCESS_START) * 1000:8.1f}  (+{(when - previous) * 1000:7.1f})  {label}")
+            previous = when
@@ -0,0 +1,92 @@
+"""Fixed-size per-frame telemetry recorder with a compact binary dump
+
+File layout (little endian), readable with mmap by telemetry_report.py:
+
+    8s   magic b"CR84TLM\\0"
+    H    format version
+    H    number of columns
+    I    number of rows
+    Q    index of the first row within the run (older frames were overwritten)
+    16s  column name, once per column, NUL padded
+    d    row-major float64 values, rows in chronological order
+"""
+import gc
+import os
+import struct
+from array import array
+
+MAGIC = b"CR84TLM\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")
+NAME_SIZE = 16
+
+COLUMNS = ("frame_ms", "update_ms", "draw_ms", "obstacles", "game_speed",
+           "beat", "allocs", "gc_runs")
+
+
+class TelemetryRecorder:
+    """Ring buffer of per-frame metrics, preallocated so recording never allocates"""
+    def __init__(self, capacity=36000):  # Ten minutes at 60 fps
+        self.capacity = capacity
+        self.width = len(COLUMNS)
+        self.data = array('d', bytes(8 * capacity * self.width))
+        self.count = 0
+        self.gc_runs = 0
+        self.last_gc_runs = 0
+        self.last_gc_count = gc.get_count()[0]
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_runs += 1
+
+    def record(self, frame_ms, update_ms, draw_ms, obstacles, game_speed, beat):
+        """Store one frame; allocation and GC counts are sampled here"""
+        # Net container allocations since the last frame. The generation 0
+        # counter resets on every collection, so after one we only see the tail
+        gc_count = gc.get_count()[0]
+        allocs = gc_count - self.last_gc_count if self.gc_runs == self.last_gc_runs else gc_count
+        self.last_gc_count = gc_count
+
+        data = self.data
+        base = (self.count % self.capacity) * self.width
+        data[base] = frame_ms
+        data[base + 1] = update_ms
+        data[base + 2] = draw_ms
+        data[base + 3] = obstacles
+        data[base + 4] = game_speed
+        data[base + 5] = beat
+        data[base + 6] = allocs
+        data[base + 7] = self.gc_runs - self.last_gc_runs
+        self.last_gc_runs = self.gc_runs
+        self.count += 1
+
+    def dump(self, path):
+        """Write the recorded frames, oldest first; returns the row count"""
+        rows = min(self.count, self.capacity)
+        first = self.count - rows
+        start = (first % self.capacity) * self.width
+        end = start + rows * self.width
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.width, rows, first))
+            for name in COLUMNS:
+                f.write(name.encode("ascii").ljust(NAME_SIZE, b"\0"))
+            if end <= len(self.data):
+                self.data[start:end].tofile(f)
+            else:
+                self.data[start:].tofile(f)
+                self.data[:end - len(self.data)].tofile(f)
+        return rows
+
+    def dump_run(self, directory="telemetry"):
+        """Save as last_run.cr84t, keeping the run before it as previous_run.cr84t"""
+        if not self.count:
+            return None
+        path = os.path.join(directory, "last_run.cr84t")
+        if os.path.exists(path):
+            os.replace(path, os.path.join(directory, "previous_run.cr84t"))
+        self.dump(path)
+        return path
@@ -0,0 +1,66 @@
+"""Summarise a telemetry dump written by telemetry.py
+
+Usage: python telemetry_report.py [telemetry/last_run.cr84t] [--worst 10]
+"""
+import mmap
+import sys
+
+from telemetry import HEADER, MAGIC, NAME_SIZE
+
+
+def load(path):
+    """Map the file and return (column names, first frame index, rows as a flat float view)"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, width, rows, first = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a telemetry file")
+    offset = HEADER.size
+    names = []
+    for _ in range(width):
+        names.append(mapped[offset:offset + NAME_SIZE].rstrip(b"\0").decode("ascii"))
+        offset += NAME_SIZE
+    values = memoryview(mapped)[offset:offset + rows * width * 8].cast("d")
+    return names, first, values
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(path, worst=10):
+    names, first, values = load(path)
+    width = len(names)
+    rows = len(values) // width
+    print(f"{path}: {rows} frames (frames {first}-{first + rows - 1} of the run)")
+    if not rows:
+        return
+
+    print(f"{'column':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for column, name in enumerate(names):
+        ordered = sorted(values[column::width])
+        print(f"{name:<12}{sum(ordered) / rows:>10.2f}{percentile(ordered, 0.5):>10.2f}"
+              f"{percentile(ordered, 0.95):>10.2f}{percentile(ordered, 0.99):>10.2f}{ordered[-1]:>10.2f}")
+
+    # Stutters: frames taking more than twice the median frame time
+    frame_times = values[0::width]
+    median = percentile(sorted(frame_times), 0.5)
+    stutters = [i for i in range(rows) if frame_times[i] > 2 * median]
+    print(f"\n{len(stutters)} frames over {2 * median:.1f} ms (twice the median)")
+    print("Worst frames:")
+    print(f"{'frame':>8}" + "".join(f"{name:>12}" for name in names))
+    for i in sorted(range(rows), key=lambda i: frame_times[i], reverse=True)[:worst]:
+        print(f"{first + i:>8}" + "".join(f"{values[i * width + c]:>12.2f}" for c in range(width)))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", default="telemetry/last_run.cr84t")
+    parser.add_argument("--worst", type=int, default=10)
+    args = parser.parse_args()
+    try:
+        report(args.path, args.worst)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
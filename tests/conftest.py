@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Headless SDL, and the repository root on the path so the game's top-level modules import
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def game():
+    """main.py with its display open"""
+    import main
+    if main.screen is None:
+        main.init_display()
+    return main
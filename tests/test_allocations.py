@@ -0,0 +1,63 @@
+"""Draw paths that bake their sprites must not allocate surfaces once warmed up"""
+import itertools
+import math
+
+from alloc_tracker import assert_no_surface_allocations
+from level_stream import Spawn
+
+
+def test_obstacles_draw_from_baked_sprites(game):
+    # Baked ahead in every colour as the game does, so a respawn in a new colour is a cache hit
+    game.bake_obstacle_sprites([Spawn(0, shape_type, 30, 30) for shape_type in game.OBSTACLE_TYPES])
+    pool = game.ObstaclePool(capacity=16)
+    for i, shape_type in enumerate(game.OBSTACLE_TYPES):
+        pool.spawn(100 + 120 * i, shape_type, 5, 30, 30)
+    shape_types = itertools.cycle(game.OBSTACLE_TYPES)
+    wrapped = []
+
+    def step():
+        # Scroll the obstacles and respawn each one that leaves on the left at
+        # the right edge, so retired records are reset and drawn again
+        for _ in range(pool.update(20)):
+            wrapped.append(pool.spawn(game.WIDTH, next(shape_types), 5, 30, 30))
+        for obstacle in pool:
+            obstacle.draw()
+
+    assert_no_surface_allocations(step)
+    assert len(wrapped) > len(game.OBSTACLE_TYPES)
+
+
+def test_particles_draw_from_baked_sprites(game):
+    particles = game.ParticleSystem(game.PARTICLE_COLORS, capacity=500)
+
+    def step():
+        particles.burst(400, 200, 20, 4, (0, game.SPARK_COLOR), spread=math.tau)
+        particles.update()
+        particles.draw(game.screen)
+
+    assert_no_surface_allocations(step)
+
+
+def test_palette_path_reuses_its_layers(game, monkeypatch):
+    monkeypatch.setattr(game.options, "palette", True)
+    game.bake_halos()
+    baked_halos = set(game.halo_cache.ladders)
+    indexed_halos = len(game.player_indexed_halos)
+    player = game.Player()
+    colors = iter(game.NEON_COLORS * 100)
+
+    def step():
+        # Recolouring through the palette must not re-bake anything
+        player.color = next(colors)
+        player.update()
+        game.draw_ground()
+        player.draw()
+
+    # The rotations and trail squares are baked as the first jump goes round
+    for rotation in range(0, 360, 5):
+        player.rotation = rotation
+        player.draw()
+    player.jump()
+    assert_no_surface_allocations(step, frames=60, warmup=30)
+    assert set(game.halo_cache.ladders) == baked_halos
+    assert len(game.player_indexed_halos) == indexed_halos
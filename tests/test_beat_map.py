@@ -0,0 +1,30 @@
+"""Beat maps round-trip their analysis and refuse damaged files"""
+import pytest
+
+from beat_map import BeatMap, find_beat_map, load_beat_map, path_for, write_beat_map
+
+
+def test_beat_map_round_trip(tmp_path):
+    audio = tmp_path / "track.wav"
+    beats = [250 + 500 * i for i in range(40)]
+    onsets = [250.25 + 250 * i for i in range(80)]
+    strengths = bytes(range(1, 81))
+    size = write_beat_map(path_for(str(audio)), BeatMap(120.0, 250.0, 20000.0, beats, onsets, strengths))
+    assert size == (tmp_path / "track.cr84b").stat().st_size
+
+    beat_map = find_beat_map(str(audio))
+    assert beat_map.bpm == 120.0 and beat_map.beat_ms == 500.0
+    assert beat_map.offset_ms == 250.0 and beat_map.duration_ms == 20000.0
+    assert list(beat_map.beats) == beats
+    assert list(beat_map.onsets) == onsets
+    assert bytes(beat_map.strengths) == strengths
+
+
+def test_beat_map_rejects_truncated_files(tmp_path):
+    path = tmp_path / "track.cr84b"
+    write_beat_map(str(path), BeatMap(100.0, 0.0, 1000.0, [0.0, 600.0], [0.0], b"\xff"))
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(ValueError):
+        load_beat_map(str(path))
+    assert find_beat_map(str(tmp_path / "track.wav")) is None
+    assert find_beat_map(str(tmp_path / "missing.wav")) is None
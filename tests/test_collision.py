@@ -0,0 +1,52 @@
+"""Bounding box, mask and swept collision between the player and obstacles"""
+
+
+def grounded_player(game):
+    player = game.Player()
+    player.prev_y = player.y
+    return player
+
+
+def test_fast_obstacle_cannot_tunnel_through_the_player(game):
+    player = grounded_player(game)
+    obstacle = game.Obstacle(300, "rect", 5, 20, 40)
+    obstacle.update(400)  # One update carries it from in front of the player to behind it
+    assert obstacle.x + obstacle.width < player.x
+    assert not game.check_collision(player, obstacle)
+    toi = game.swept_collision(player, obstacle)
+    assert toi is not None and 0 < toi < 1
+
+
+def test_jumping_over_an_obstacle_is_not_a_hit(game):
+    player = grounded_player(game)
+    player.y = player.prev_y = 0
+    obstacle = game.Obstacle(300, "rect", 5, 20, 40)
+    obstacle.update(400)
+    assert game.swept_collision(player, obstacle) is None
+
+
+def test_obstacle_that_stops_short_is_not_a_hit(game):
+    player = grounded_player(game)
+    obstacle = game.Obstacle(400, "rect", 5, 20, 40)
+    obstacle.update(200)
+    assert obstacle.x > player.x + player.size
+    assert game.swept_collision(player, obstacle) is None
+
+
+def test_spike_uses_its_exact_shape(game):
+    player = grounded_player(game)
+    spike = game.Obstacle(0, "triangle", 5, 40, 40)
+    # The player's bottom right corner sits inside the spike's bounding box
+    # but above its slope
+    hitbox = game.player_hitbox(player)
+    spike.x = spike.prev_x = hitbox.right - 6
+    player.y = player.prev_y = spike.y + 8 - (hitbox.bottom - player.y)
+    assert game.player_hitbox(player).colliderect(game.obstacle_hitbox(spike))
+    assert not game.check_collision(player, spike)
+    assert game.swept_collision(player, spike) is None
+
+    # A box in the same place is a hit
+    box = game.Obstacle(spike.x, "rect", 5, 40, 40)
+    box.prev_x = box.x
+    assert game.check_collision(player, box)
+    assert game.swept_collision(player, box) == 0.0
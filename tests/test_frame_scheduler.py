@@ -0,0 +1,39 @@
+"""Game time across a long stall, capped for normal play and uncapped for beat sync"""
+import asyncio
+import time
+
+from beat_grid import BeatGrid
+from frame_scheduler import FrameScheduler
+
+STALL_SECONDS = 0.3
+
+
+def run_with_stall(scheduler, frames=10, stall_frame=4):
+    """Game and wall-clock milliseconds over `frames` frames, one of which stalls"""
+    async def run():
+        await scheduler.next_frame()
+        wall_start, game_start = time.perf_counter(), scheduler.game_time
+        for frame in range(frames):
+            if frame == stall_frame:
+                time.sleep(STALL_SECONDS)
+            await scheduler.next_frame()
+        return scheduler.game_time - game_start, (time.perf_counter() - wall_start) * 1000
+    return asyncio.run(run())
+
+
+def test_a_stall_is_capped_in_normal_play():
+    scheduler = FrameScheduler(fps=1000)
+    game_ms, wall_ms = run_with_stall(scheduler)
+    assert scheduler.stalls == 1
+    assert game_ms <= wall_ms - STALL_SECONDS * 1000 + scheduler.max_step_ms + 1
+
+
+def test_beat_sync_scrolls_with_the_music_through_a_stall():
+    scheduler = FrameScheduler(fps=1000)
+    scheduler.catch_up = True
+    game_ms, wall_ms = run_with_stall(scheduler)
+    assert scheduler.stalls == 1
+    # The music kept playing through the stall, so play time has to match it
+    assert abs(game_ms - wall_ms) < 1
+    grid = BeatGrid(seed=5, bpm=120)
+    assert abs(grid.distance_at(game_ms) - grid.distance_at(wall_ms)) < 1
@@ -0,0 +1,101 @@
+"""Ghost files round-trip a run's heights, match their level and refuse other files"""
+import random
+
+import pytest
+
+from ghosts import Ghost, GhostRecorder, load_ghosts, read_header
+from level_stream import level_key
+
+
+def test_ghost_round_trip(tmp_path):
+    rng = random.Random(3)
+    heights = [315.0] * 50 + [rng.uniform(-500, 800) for _ in range(2000)] + [315.0] * 50
+    recorder = GhostRecorder(seed=1234, spawn_density=1.5, name="tester", level_key="varied x1.5 max12")
+    for y in heights:
+        recorder.record(y)
+    path = tmp_path / "run.cr84g"
+    recorder.save(str(path), score=99)
+
+    assert read_header(str(path)) == (1234, len(heights), 99, 1.5, "tester", "varied x1.5 max12")
+    # A small chunk size makes the decoder resume varints across reads
+    ghost = Ghost(str(path), ground_y=315, chunk_size=7)
+    played = []
+    while True:
+        ghost.advance()
+        if ghost.finished:
+            break
+        played.append(ghost.y)
+    assert played == [round(y) for y in heights]
+
+
+def test_ghost_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.cr84g"
+    path.write_bytes(b"not a ghost at all, just some bytes")
+    with pytest.raises(ValueError):
+        read_header(str(path))
+    assert load_ghosts([str(path)], ground_y=315) == (None, [])
+
+
+def save_ghost(directory, name, seed, key, score=1):
+    recorder = GhostRecorder(seed, level_key=key)
+    recorder.record(315)
+    path = directory / name
+    recorder.save(str(path), score)
+    return str(path)
+
+
+def test_ghosts_only_replay_on_the_level_they_were_recorded_on(tmp_path):
+    classic = level_key('classic')
+    varied = level_key('varied')
+    beat = level_key('varied', beat_ms=500, beat_offset_ms=20)
+    assert len({classic, varied, beat, level_key('varied', spawn_density=2),
+                level_key('varied', max_speed=30), level_key('varied', beat_ms=480, beat_offset_ms=20)}) == 6
+    paths = [save_ghost(tmp_path, "varied.cr84g", 7, varied),
+             save_ghost(tmp_path, "classic.cr84g", 7, classic),
+             save_ghost(tmp_path, "beat.cr84g", 7, beat),
+             save_ghost(tmp_path, "other.cr84g", 8, classic)]
+
+    seed, ghosts = load_ghosts(paths, ground_y=315, level_key=classic)
+    assert seed == 7 and [ghost.path for ghost in ghosts] == [paths[1]]
+    seed, ghosts = load_ghosts(paths, ground_y=315, seed=8, level_key=classic)
+    assert [ghost.path for ghost in ghosts] == [paths[3]]
+    seed, ghosts = load_ghosts(paths, ground_y=315, seed=7, level_key=beat)
+    assert [ghost.path for ghost in ghosts] == [paths[2]]
+    assert load_ghosts(paths, ground_y=315, level_key=level_key('mixed')) == (None, [])
+
+
+def test_damaged_ghost_stops_instead_of_crashing(tmp_path):
+    recorder = GhostRecorder(seed=5)
+    rng = random.Random(8)
+    for _ in range(5000):
+        recorder.record(rng.uniform(-500, 800))
+    path = tmp_path / "run.cr84g"
+    recorder.save(str(path), score=1)
+    data = bytearray(path.read_bytes())
+    for i in range(len(data) // 2, len(data)):
+        data[i] ^= 0x5A
+    path.write_bytes(bytes(data))
+
+    seed, ghosts = load_ghosts([str(path)], ground_y=315)
+    assert seed == 5 and len(ghosts) == 1
+    ghost = ghosts[0]
+    for _ in range(recorder.ticks + 1):
+        ghost.advance()
+    assert ghost.finished
+
+
+def test_truncated_ghost_ends_early(tmp_path):
+    recorder = GhostRecorder(seed=5)
+    rng = random.Random(9)
+    for _ in range(5000):
+        recorder.record(rng.uniform(-500, 800))
+    path = tmp_path / "run.cr84g"
+    size = recorder.save(str(path), score=1)
+    path.write_bytes(path.read_bytes()[:size // 2])
+
+    ghost = Ghost(str(path), ground_y=315, chunk_size=64)
+    ticks = 0
+    while not ghost.finished:
+        ghost.advance()
+        ticks += 1
+    assert ticks <= recorder.ticks
@@ -0,0 +1,133 @@
+"""The high score store's writer and leaderboards, and the game running without sqlite3"""
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import highscores
+from highscores import HighScoreStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WITHOUT_SQLITE = """
+import sys
+sys.modules['sqlite3'] = None  # As in a Python build without it
+import main
+main.init_display()
+print(main.record_run(10, 1, "", 1.0))
+"""
+
+
+def test_game_imports_and_records_runs_without_sqlite3(tmp_path):
+    result = subprocess.run([sys.executable, "-c", WITHOUT_SQLITE], cwd=tmp_path,
+                            env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "Could not record high score" in result.stdout
+    assert result.stdout.strip().endswith("[]")
+    assert not (tmp_path / "highscores.sqlite3").exists()
+
+
+def test_level_board_only_ranks_runs_laid_out_the_same_way(tmp_path):
+    store = HighScoreStore(str(tmp_path / "scores.sqlite3"))
+    store.add("a", 100, 7, 10.0, "classic x1 max12")
+    store.add("b", 300, 7, 10.0, "varied x1 max12")
+    store.add("c", 200, 7, 10.0, "classic x1 max12")
+    store.add("d", 900, 8, 10.0, "classic x1 max12")
+    store.close()
+
+    store = HighScoreStore(str(tmp_path / "scores.sqlite3"))
+    assert [run[0] for run in store.top_for_level(7, "classic x1 max12")] == ["c", "a"]
+    assert [run[0] for run in store.top_for_level(7, "varied x1 max12")] == ["b"]
+    store.close()
+
+
+def test_database_from_before_levels_is_upgraded(tmp_path):
+    path = str(tmp_path / "scores.sqlite3")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE runs (id INTEGER PRIMARY KEY, player TEXT NOT NULL, score INTEGER NOT NULL, "
+                           "day TEXT NOT NULL, played_at REAL NOT NULL, seed INTEGER NOT NULL, duration REAL NOT NULL)")
+        connection.execute("INSERT INTO runs (player, score, day, played_at, seed, duration) "
+                           "VALUES ('old', 50, '2026-01-01', 0, 7, 1.0)")
+    connection.close()
+
+    store = HighScoreStore(path)
+    store.add("new", 60, 7, 1.0, "classic x1 max12")
+    store.close()
+    store = HighScoreStore(path)
+    assert [run[0] for run in store.top_for_level(7, "classic x1 max12")] == ["new"]
+    assert store.count() == 2
+    store.close()
+
+
+def fill(store, runs):
+    for player, score, seed, day in runs:
+        played_at = time.mktime(time.strptime(day + " 12:00", "%Y-%m-%d %H:%M"))
+        store.add(player, score, seed, 1.0, "classic x1 max12", played_at=played_at)
+
+
+def test_close_writes_every_queued_run(tmp_path):
+    path = str(tmp_path / "scores.sqlite3")
+    # A long flush interval, so nothing is committed before close() unless a batch fills
+    store = HighScoreStore(path, batch_size=1000, flush_interval=60)
+    for score in range(100):
+        store.add("p", score, 1, 1.0)
+    store.close()
+
+    store = HighScoreStore(path)
+    assert store.count() == 100
+    assert [run[1] for run in store.top(3)] == [99, 98, 97]
+    store.close()
+
+
+class RecordingConnection:
+    """Passes everything through to a sqlite3 connection, noting executemany() batch sizes"""
+    def __init__(self, connection, batches):
+        self.connection = connection
+        self.batches = batches
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self.batches.append(len(rows))
+        return self.connection.executemany(sql, rows)
+
+    def __enter__(self):
+        return self.connection.__enter__()
+
+    def __exit__(self, *exc):
+        return self.connection.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+def test_writer_commits_queued_runs_in_batches(tmp_path, monkeypatch):
+    batches = []
+    connect = highscores.connect
+    monkeypatch.setattr(highscores, "connect", lambda path: RecordingConnection(connect(path), batches))
+    store = highscores.HighScoreStore(str(tmp_path / "scores.sqlite3"), batch_size=16, flush_interval=5)
+    for score in range(40):
+        store.add("p", score, 1, 1.0)
+    store.close()
+    assert batches == [16, 16, 8]
+
+
+def test_leaderboards_filter_and_order_their_runs(tmp_path):
+    path = str(tmp_path / "scores.sqlite3")
+    store = HighScoreStore(path)
+    fill(store, [("ann", 120, 1, "2026-03-01"), ("bob", 300, 1, "2026-03-01"),
+                 ("ann", 250, 2, "2026-03-02"), ("cat", 90, 1, "2026-03-02"),
+                 ("bob", 40, 2, "2026-03-01"), ("ann", 500, 3, "2026-02-28")])
+    store.close()
+
+    store = HighScoreStore(path)
+    assert [run[:2] for run in store.top(2)] == [("ann", 500), ("bob", 300)]
+    assert [run[:2] for run in store.top_for_day("2026-03-01")] == [("bob", 300), ("ann", 120), ("bob", 40)]
+    assert [run[:2] for run in store.top_for_day("2026-03-02", n=1)] == [("ann", 250)]
+    assert [run[1] for run in store.top_for_level(1, "classic x1 max12")] == [300, 120, 90]
+    # A player's personal best is the first of their runs
+    assert [run[1] for run in store.top_for_player("ann")] == [500, 250, 120]
+    assert store.top_for_player("bob", n=1)[0][1:4] == (300, "2026-03-01", 1)
+    assert store.top_for_player("dan") == []
+    store.close()
@@ -0,0 +1,51 @@
+"""Level files round-trip the generator's spawns and stream them back in order"""
+import pytest
+
+from level_file import LevelFile, POSITION_SCALE, write_level
+from level_stream import LevelStream
+
+
+def test_level_file_round_trip(tmp_path):
+    distance = 60000
+    stream = LevelStream(seed=7, patterns='varied')
+    expected = []
+    while stream.peek()[0].position <= distance:
+        expected.append(stream.pop_due(stream.peek()[0].position))
+    path = tmp_path / "level.cr84l"
+    assert write_level(str(path), expected, seed=7, chunk_length=1000) == len(expected)
+
+    level = LevelFile(str(path))
+    assert level.seed == 7
+    loaded = list(level.spawns())
+    level.close()
+    assert [(s.shape_type, s.width, s.height) for s in loaded] == \
+           [(s.shape_type, s.width, s.height) for s in expected]
+    for got, want in zip(loaded, expected):
+        assert abs(got.position - want.position) <= 0.5 / POSITION_SCALE
+
+
+def test_level_file_streams_like_the_generator(tmp_path):
+    stream = LevelStream(seed=11)
+    spawns = []
+    while stream.peek()[0].position <= 30000:
+        spawns.append(stream.pop_due(stream.peek()[0].position))
+    path = tmp_path / "level.cr84l"
+    write_level(str(path), spawns, chunk_length=500)
+
+    level = LevelFile(str(path))
+    popped = []
+    for distance in range(0, 30001, 7):
+        spawn = level.pop_due(distance)
+        while spawn is not None:
+            assert spawn.position <= distance
+            popped.append(spawn)
+            spawn = level.pop_due(distance)
+    level.close()
+    assert len(popped) == len(spawns)
+
+
+def test_level_file_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.cr84l"
+    path.write_bytes(b"CR84GHO\0" + bytes(64))
+    with pytest.raises(ValueError):
+        LevelFile(str(path))
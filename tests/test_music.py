@@ -0,0 +1,22 @@
+"""The synthesized music loop is built over many frames, not in one go"""
+import asyncio
+
+
+def test_music_loop_is_synthesized_across_frames(game, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(game, "MUSIC_FRAME_BUDGET", 0)
+    sounds = game.SoundManager()
+    frames = 0
+
+    async def run():
+        nonlocal frames
+        task = asyncio.ensure_future(sounds._load_music())
+        while not task.done():
+            frames += 1
+            await asyncio.sleep(0)
+        task.result()
+
+    asyncio.run(run())
+    assert frames > 16
+    with open(sounds.music_file, "rb") as f:
+        assert f.read()[44:] == sounds.music_samples()
@@ -0,0 +1,43 @@
+"""Obstacle sizes, baking sprites ahead of spawns and retiring obstacles off the left edge"""
+import random
+
+from level_stream import LevelStream, double_spike
+
+
+def test_obstacles_keep_the_size_they_are_given(game):
+    box = game.Obstacle(0, "rect", 5, 30, 50)
+    assert (box.width, box.height) == (30, 50)
+    spike = game.Obstacle(0, "triangle", 5, 25)
+    assert (spike.width, spike.height) == (25, 25)
+    assert spike.body.get_size() == (25, 25)
+
+
+def test_upcoming_spawns_are_baked_before_they_spawn(game):
+    stream = LevelStream(seed=4, patterns='varied')
+    upcoming = stream.peek(game.OBSTACLE_BAKE_AHEAD)
+    assert game.bake_obstacle_sprites(upcoming, limit=1) <= 1
+    game.bake_obstacle_sprites(upcoming)
+    assert game.bake_obstacle_sprites(upcoming) == 0
+    baked = set(game.sprite_cache)
+    for spawn in upcoming:
+        obstacle = game.Obstacle(0, spawn.shape_type, 5, spawn.width, spawn.height)
+        assert (obstacle.width, obstacle.height) == (spawn.width, spawn.height)
+    assert set(game.sprite_cache) == baked
+
+
+def test_double_spikes_are_spaced_by_their_drawn_width(game):
+    rng = random.Random(6)
+    for _ in range(50):
+        (first, second), length = double_spike(rng, None)
+        spike = game.Obstacle(first[0], first[1], 5, first[2], first[3])
+        # The second spike starts exactly where the first one's base ends
+        assert second[0] - first[0] == spike.width
+        assert length == spike.width * 2
+
+
+def test_obstacle_retires_once_its_glow_has_left_the_screen(game):
+    obstacle = game.Obstacle(0, "floating", 5, 80, 20)
+    obstacle.x = -obstacle.width - obstacle.margin
+    assert not obstacle.is_off_screen()
+    obstacle.x -= 1
+    assert obstacle.is_off_screen()
@@ -0,0 +1,24 @@
+"""Telemetry dumps read back in frame order after the ring buffer wraps"""
+import gc
+
+from telemetry import COLUMNS, TelemetryRecorder
+from telemetry_report import load as load_telemetry
+
+
+def test_telemetry_round_trip_after_wrapping(tmp_path):
+    recorder = TelemetryRecorder(capacity=5)
+    try:
+        for frame in range(8):
+            recorder.record(frame + 0.5, 1.0, 2.0, frame, 5.0, frame % 2)
+        path = tmp_path / "run.cr84t"
+        assert recorder.dump(str(path)) == 5
+    finally:
+        gc.callbacks.remove(recorder._on_gc)
+
+    names, first, values = load_telemetry(str(path))
+    assert names == list(COLUMNS)
+    assert first == 3
+    rows = [values[i * len(names):(i + 1) * len(names)].tolist() for i in range(5)]
+    assert [row[0] for row in rows] == [3.5, 4.5, 5.5, 6.5, 7.5]
+    assert [row[3] for row in rows] == [3, 4, 5, 6, 7]
+    assert [row[5] for row in rows] == [1, 0, 1, 0, 1]